@@ -0,0 +1,128 @@
+"""
+Database profiles for dendo.
+
+``APP_DATABASE`` picks the profile (``sqlite`` or ``postgres``); every knob
+below can be overridden from the environment. Defaults:
+
+Shared
+    DB_CONN_MAX_AGE        60      seconds a connection is reused (0 = per request)
+    DB_CONN_HEALTH_CHECKS  true    ping reused connections before a request uses them
+
+PostgreSQL
+    DB_POOL                false   use psycopg's connection pool (forces CONN_MAX_AGE=0)
+    DB_POOL_MIN_SIZE       2
+    DB_POOL_MAX_SIZE       10
+    DB_POOL_TIMEOUT        10      seconds to wait for a free pooled connection
+    DB_STATEMENT_TIMEOUT   5000    milliseconds, 0 disables
+    DB_CONNECT_TIMEOUT     5       seconds
+
+Replica (optional, see dendo/routers.py)
+    DB_REPLICA_PATH        unset   SQLite file of the replica
+    DB_REPLICA_HOST        unset   PostgreSQL replica host, DB_REPLICA_PORT/NAME/
+                                   USERNAME/PASSWORD fall back to the primary's
+    DB_REPLICA_STICKY_SECONDS 5    primary-only window after a client writes
+
+SQLite
+    DB_SQLITE_JOURNAL_MODE WAL     readers no longer block the single writer
+    DB_SQLITE_SYNCHRONOUS  NORMAL  safe with WAL, one fsync per checkpoint
+    DB_SQLITE_CACHE_SIZE   -20000  negative = KiB (about 20 MB page cache)
+    DB_SQLITE_MMAP_SIZE    134217728  bytes of the file mapped into memory
+    DB_SQLITE_BUSY_TIMEOUT 5       seconds a writer waits for the lock
+    DB_SQLITE_TRANSACTION_MODE IMMEDIATE  take the write lock at BEGIN
+"""
+import os
+
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() == 'true'
+
+
+def env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def postgres_profile(base_dir):
+    options = {
+        'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 5),
+    }
+
+    statement_timeout = env_int('DB_STATEMENT_TIMEOUT', 5000)
+    if statement_timeout:
+        options['options'] = f'-c statement_timeout={statement_timeout}'
+
+    conn_max_age = env_int('DB_CONN_MAX_AGE', 60)
+    if env_bool('DB_POOL', False):
+        options['pool'] = {
+            'min_size': env_int('DB_POOL_MIN_SIZE', 2),
+            'max_size': env_int('DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int('DB_POOL_TIMEOUT', 10),
+        }
+        conn_max_age = 0
+
+    return {
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
+        'USER': os.getenv('DB_USERNAME'),
+        'PASSWORD': os.getenv('DB_PASSWORD'),
+        'HOST': os.getenv('DB_HOST'),
+        'PORT': os.getenv('DB_PORT'),
+        'NAME': os.getenv('DB_NAME'),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': options,
+    }
+
+
+def sqlite_profile(base_dir):
+    pragmas = {
+        'journal_mode': os.getenv('DB_SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('DB_SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': env_int('DB_SQLITE_CACHE_SIZE', -20000),
+        'mmap_size': env_int('DB_SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+    }
+
+    return {
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': base_dir / os.getenv('DB_PATH', 'db.sqlite3'),
+        'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            'init_command': ''.join(f'PRAGMA {name}={value};' for name, value in pragmas.items()),
+            'transaction_mode': os.getenv('DB_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'timeout': env_int('DB_SQLITE_BUSY_TIMEOUT', 5),
+        },
+    }
+
+
+PROFILES = {
+    'postgres': postgres_profile,
+    'sqlite': sqlite_profile,
+}
+
+
+def build_database(profile, base_dir):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}', expected one of: {', '.join(PROFILES)}")
+    return PROFILES[profile](base_dir)
+
+
+def build_replica(profile, base_dir):
+    """
+    Returns the replica settings for ``profile`` or None when no replica is
+    configured. The replica mirrors the primary in tests.
+    """
+    database = build_database(profile, base_dir)
+
+    if profile == 'sqlite':
+        if not os.getenv('DB_REPLICA_PATH'):
+            return None
+        database['NAME'] = base_dir / os.getenv('DB_REPLICA_PATH')
+    else:
+        if not os.getenv('DB_REPLICA_HOST'):
+            return None
+        database['HOST'] = os.getenv('DB_REPLICA_HOST')
+        for key, name in (('PORT', 'PORT'), ('NAME', 'NAME'), ('USER', 'USERNAME'), ('PASSWORD', 'PASSWORD')):
+            database[key] = os.getenv(f'DB_REPLICA_{name}', database[key])
+
+    database['TEST'] = {'MIRROR': 'default'}
+    return database
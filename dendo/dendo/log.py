@@ -0,0 +1,117 @@
+"""
+Logging pipeline.
+
+Loggers only hand records to a ``NonBlockingQueueHandler``; a
+``QueueListener`` thread per queue formats them as JSON lines and does
+the file and stream I/O, so request threads never wait on a disk write,
+a file lock or a rotation. When a queue is full, records are dropped
+instead of blocking the caller.
+
+``configure()`` is Django's LOGGING_CONFIG: it applies LOGGING with
+dictConfig, starts the listeners and stops them at interpreter exit,
+which drains every queued record before the file handlers are closed.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.config
+import queue
+import random
+from logging.handlers import QueueHandler
+
+_listeners = []
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Structured fields passed as
+    ``extra={'data': {...}}`` are merged into the object.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        status_code = getattr(record, 'status_code', None)
+        if status_code is not None:
+            entry['status_code'] = status_code
+
+        data = getattr(record, 'data', None)
+        if isinstance(data, dict):
+            entry.update(data)
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps roughly ``rate`` of the records below ``min_level`` (a share
+    between 0 and 1). Warnings and errors always pass.
+    """
+
+    def __init__(self, rate=1.0, min_level='WARNING'):
+        super().__init__()
+        self.rate = float(rate)
+        self.min_level = logging._checkLevel(min_level)
+
+    def filter(self, record):
+        if record.levelno >= self.min_level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Unlike QueueHandler.prepare the message is not pre-formatted, so
+        # the listener's JsonFormatter still sees the structured record.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # Request objects are only useful to in-process handlers.
+        record.request = None
+        return record
+
+
+def stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def configure(config):
+    stop_listeners()
+    logging.config.dictConfig(config)
+
+    loggers = [logger for logger in logging.root.manager.loggerDict.values() if isinstance(logger, logging.Logger)]
+    for logger in loggers + [logging.root]:
+        for handler in logger.handlers:
+            listener = getattr(handler, 'listener', None)
+            if listener is not None and listener not in _listeners and listener._thread is None:
+                listener.start()
+                _listeners.append(listener)
+
+
+atexit.register(stop_listeners)
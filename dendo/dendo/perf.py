@@ -0,0 +1,188 @@
+"""
+Per-request performance instrumentation.
+
+``RequestTimingMiddleware`` collects, for every request, the wall time,
+the number and duration of database queries (through a connection
+execute wrapper), cache hits and misses of the dendo caches, time spent
+hashing passwords and time spent rendering templates. Each request is
+logged on the ``dendo.perf`` logger with its numbers in ``record.data``;
+dendo.log.JsonFormatter writes it as one JSON line, which
+``manage.py perf_report`` aggregates per URL name. With PERF_SERVER_TIMING
+the same numbers are sent in a Server-Timing header.
+
+Code measured outside a request (management commands, task workers) is
+not recorded.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('dendo.perf')
+
+_metrics = ContextVar('dendo_perf_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('db_queries', 'db_time', 'cache_hits', 'cache_misses', 'hash_time', 'template_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.hash_time = 0.0
+        self.template_time = 0.0
+
+
+def current():
+    return _metrics.get()
+
+
+@contextmanager
+def timed(attribute):
+    """
+    Adds the time spent in the block to ``attribute`` of the current
+    request's metrics.
+    """
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - started)
+
+
+def count_cache(value):
+    """
+    Records a cache lookup result as a hit or miss and returns it.
+    """
+    metrics = _metrics.get()
+    if metrics is not None:
+        if value is None:
+            metrics.cache_misses += 1
+        else:
+            metrics.cache_hits += 1
+    return value
+
+
+def query_wrapper(execute, sql, params, many, context):
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_wrapper(connection):
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    install_query_wrapper(connection)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template_time'):
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend whose templates report their render time.
+    Included and extended templates are part of the outer render.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        # Connections opened before this module was imported missed the
+        # connection_created signal.
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def start(self):
+        metrics = RequestMetrics()
+        return metrics, _metrics.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+
+        if getattr(settings, 'PERF_LOG_ENABLED', True):
+            logger.info('request', extra={'data': {
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'url_name': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'db_queries': metrics.db_queries,
+                'db_ms': round(metrics.db_time * 1000, 2),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'hash_ms': round(metrics.hash_time * 1000, 2),
+                'template_ms': round(metrics.template_time * 1000, 2),
+            }})
+
+        if getattr(settings, 'PERF_SERVER_TIMING', False):
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={duration * 1000:.1f}',
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"',
+                f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"',
+                f'hash;dur={metrics.hash_time * 1000:.1f}',
+                f'template;dur={metrics.template_time * 1000:.1f}',
+            ])
+        return response
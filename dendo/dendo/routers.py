@@ -0,0 +1,109 @@
+"""
+Primary/replica routing.
+
+Reads go to the replica only inside ``replica_reads()`` blocks, which the
+read-only paths (public profile pages, signup availability checks, admin
+list pages) opt into. Everything else, and every write, stays on the
+primary. After a request writes, ``ReplicaRoutingMiddleware`` pins that
+client to the primary for ``DATABASE_REPLICA_STICKY_SECONDS`` so users
+read their own writes while the replica catches up.
+
+Locally, two SQLite files are enough to try it out: point DB_REPLICA_PATH
+at a copy of the primary database file.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = 'dendo_primary'
+
+_routing = ContextVar('dendo_db_routing', default=None)
+_replica_reads = ContextVar('dendo_replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads_from_replica():
+    """
+    True when reads in the current context go to the replica. What they
+    return may lag the primary, so it must not be cached beyond the request.
+    """
+    replica = getattr(settings, 'DATABASE_REPLICA', None)
+    if not replica or not _replica_reads.get():
+        return False
+
+    state = _routing.get()
+    return state is None or not (state['pinned'] or state['wrote'])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica():
+            return None
+        return settings.DATABASE_REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state['wrote'] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != getattr(settings, 'DATABASE_REPLICA', None)
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+
+        state = {'pinned': pinned_until > time.time(), 'wrote': False}
+        return state, _routing.set(state)
+
+    def finish(self, state, response):
+        if state['wrote'] and getattr(settings, 'DATABASE_REPLICA', None):
+            seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+        return response
@@ -9,11 +9,18 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import atexit
+import importlib.util
 import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+from .database import build_database, build_replica, env_int
+
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,20 +53,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dendo.perf.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'dendo.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dendo_users.middleware.IdentityMemoMiddleware',
 ]
 
 ROOT_URLCONF = 'dendo.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'dendo.perf.InstrumentedDjangoTemplates',
         'DIRS': [ BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,26 +90,23 @@ WSGI_APPLICATION = 'dendo.wsgi.application'
 
 app_database = os.getenv('APP_DATABASE', 'sqlite')
 
-db_config = {
-    'postgres':{
-        'ENGINE': os.getenv('DB_ENGINE'),
-        'USERNAME': os.getenv('DB_USERNAME'),
-        'PASSWORD': os.getenv('DB_PASSWORD'),
-        'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT'),
-        'NAME': os.getenv('DB_NAME'),
-    },
-
-    'sqlite':{
-        'ENGINE': os.getenv('DB_ENGINE'),
-        'NAME': BASE_DIR / os.getenv('DB_PATH')
-    }
-}
-
+# Pooling, persistent connections, timeouts and SQLite pragmas are tuned
+# from the environment, see dendo/database.py for the knobs and defaults.
 DATABASES = {
-    'default': db_config[app_database]
+    'default': build_database(app_database, BASE_DIR)
 }
 
+# Optional read replica for read-only paths, see dendo/routers.py
+replica_database = build_replica(app_database, BASE_DIR)
+DATABASE_REPLICA = None
+
+if replica_database:
+    DATABASES['replica'] = replica_database
+    DATABASE_REPLICA = 'replica'
+
+DATABASE_ROUTERS = ['dendo.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
 AUTHENTICATION_BACKENDS = [
     'dendo_users.auth_backends.UsernameOrEmailBackend',
     'django.contrib.auth.backends.ModelBackend',
@@ -125,6 +132,35 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing (dendo_users/hashers.py); unset costs keep Django's defaults.
+# argon2 needs the argon2-cffi package (the `argon2` extra).
+HASHERS = {
+    'pbkdf2': 'dendo_users.hashers.PBKDF2PasswordHasher',
+    'argon2': 'dendo_users.hashers.Argon2PasswordHasher',
+    'scrypt': 'dendo_users.hashers.ScryptPasswordHasher',
+}
+
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER not in HASHERS:
+    raise ValueError(f"Unknown PASSWORD_HASHER '{PASSWORD_HASHER}', expected one of: {', '.join(HASHERS)}")
+if PASSWORD_HASHER == 'argon2' and importlib.util.find_spec('argon2') is None:
+    raise ValueError("PASSWORD_HASHER 'argon2' needs the argon2-cffi package, install dendo[argon2].")
+
+PASSWORD_HASHERS = [HASHERS[PASSWORD_HASHER]] + [path for name, path in HASHERS.items() if name != PASSWORD_HASHER]
+
+PASSWORD_PBKDF2_ITERATIONS = env_int('PASSWORD_PBKDF2_ITERATIONS')
+PASSWORD_ARGON2_TIME_COST = env_int('PASSWORD_ARGON2_TIME_COST')
+PASSWORD_ARGON2_MEMORY_COST = env_int('PASSWORD_ARGON2_MEMORY_COST')
+PASSWORD_ARGON2_PARALLELISM = env_int('PASSWORD_ARGON2_PARALLELISM')
+PASSWORD_SCRYPT_WORK_FACTOR = env_int('PASSWORD_SCRYPT_WORK_FACTOR')
+PASSWORD_SCRYPT_BLOCK_SIZE = env_int('PASSWORD_SCRYPT_BLOCK_SIZE')
+PASSWORD_SCRYPT_PARALLELISM = env_int('PASSWORD_SCRYPT_PARALLELISM')
+
+# Where hashes are computed: inline, thread or process (a pool of PASSWORD_HASH_WORKERS)
+PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'inline')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -147,6 +183,19 @@ STATICFILES_DIR = [ BASE_DIR / 'static' ]
 MEDIA_ROOT = os.path.join(BASE_DIR, 'uploads')
 MEDIA_URL = '/content/'
 
+# Avatars and banners are stored once per unique content, see dendo_users.storage
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'user_images': {
+        'BACKEND': 'dendo_users.storage.ContentAddressedStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -155,31 +204,237 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'dendo_users.CustomUser'
 LOGIN_URL = 'dendo_users:login_page'
 
+# Caches and sessions
+# CACHE_BACKEND picks the default cache: 'locmem' for development, or a cache
+# shared by every process ('file', 'redis', 'memcached') for deployments.
+# CACHE_LOCATION may be a directory, a redis:// or unix:// URL, or a socket.
+# 'redis' and 'memcached' need the `redis` and `memcached` extras.
+cache_backend = os.getenv('CACHE_BACKEND', 'locmem')
+
+cache_config = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dendo',
+    },
+
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+    },
+
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+}
+
+CACHES = {
+    'default': {
+        **cache_config[cache_backend],
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 300)),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'dendo'),
+    }
+}
+
+session_config = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSION_ENGINE = session_config[os.getenv('SESSION_BACKEND', 'cached_db')]
+
+# Caches that are invalidated on writes are only safe to enable by default
+# when every process shares them.
+shared_cache = '' if cache_backend == 'locmem' else 'default'
+
+# Users loaded for authenticated sessions (cache alias, empty to disable)
+AUTH_USER_CACHE = os.getenv('AUTH_USER_CACHE', shared_cache)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 300))
+
+# Username/email resolution cache shared between requests (cache alias, empty to disable)
+IDENTITY_CACHE = os.getenv('IDENTITY_CACHE', shared_cache)
+IDENTITY_CACHE_TIMEOUT = int(os.getenv('IDENTITY_CACHE_TIMEOUT', 300))
+
+# Rendered profile pages served to anonymous visitors (cache alias and seconds)
+PROFILE_CACHE = os.getenv('PROFILE_CACHE', 'default')
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', 600))
+
+# Failed login limits per client IP and per username/email within a sliding window
+# (seconds). Counters live in LOGIN_THROTTLE_CACHE, empty keeps them in-process.
+LOGIN_THROTTLE_CACHE = os.getenv('LOGIN_THROTTLE_CACHE', 'default')
+LOGIN_THROTTLE_WINDOW = int(os.getenv('LOGIN_THROTTLE_WINDOW', 300))
+LOGIN_THROTTLE_IP_LIMIT = int(os.getenv('LOGIN_THROTTLE_IP_LIMIT', 50))
+LOGIN_THROTTLE_IDENTIFIER_LIMIT = int(os.getenv('LOGIN_THROTTLE_IDENTIFIER_LIMIT', 10))
+
+# Threads the async auth views use for password hashing and form validation
+AUTH_WORKER_THREADS = int(os.getenv('AUTH_WORKER_THREADS', os.cpu_count() or 1))
+
+# last_login writes (dendo_users/last_login.py): 'always' saves it on every login,
+# 'throttled' at most once per LAST_LOGIN_INTERVAL seconds per user, 'buffered' the same
+# but written in batches by a background thread. LAST_LOGIN_CACHE (alias, empty to
+# disable) enforces the limit across processes.
+LAST_LOGIN_UPDATE = os.getenv('LAST_LOGIN_UPDATE', 'always')
+LAST_LOGIN_INTERVAL = int(os.getenv('LAST_LOGIN_INTERVAL', 600))
+LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 10.0))
+LAST_LOGIN_CACHE = os.getenv('LAST_LOGIN_CACHE', shared_cache)
+
+# Deferred tasks (image processing, file deletion) run by `manage.py run_tasks`
+TASKS_ALWAYS_EAGER = os.getenv('TASKS_ALWAYS_EAGER', 'false').lower() == 'true'
+TASKS_WORKERS = int(os.getenv('TASKS_WORKERS', 4))
+TASKS_RETRY_DELAY = int(os.getenv('TASKS_RETRY_DELAY', 30))
+TASKS_LOCK_TIMEOUT = int(os.getenv('TASKS_LOCK_TIMEOUT', 600))
+
+# User activity log (dendo_activity/buffer.py): events are buffered in-process and
+# written in batches by a background thread. 'sync' inserts each event at commit
+# time instead, 'off' disables the log. `manage.py prune_activity` deletes events
+# older than ACTIVITY_RETENTION_DAYS.
+ACTIVITY_LOG_MODE = os.getenv('ACTIVITY_LOG_MODE', 'buffered')
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', 500))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 2.0))
+ACTIVITY_MAX_BUFFER = int(os.getenv('ACTIVITY_MAX_BUFFER', 50000))
+ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', 90))
+
+# Home timelines (dendo_activity/timelines.py): posts are copied into follower inboxes
+# by `run_tasks` in batches of TIMELINE_FANOUT_BATCH followers; authors with at least
+# TIMELINE_PULL_THRESHOLD followers are merged in at read time instead. Inboxes keep
+# about TIMELINE_INBOX_SIZE entries, a new follow copies the last TIMELINE_BACKFILL posts.
+TIMELINE_FANOUT_BATCH = int(os.getenv('TIMELINE_FANOUT_BATCH', 1000))
+TIMELINE_PULL_THRESHOLD = int(os.getenv('TIMELINE_PULL_THRESHOLD', 10000))
+TIMELINE_INBOX_SIZE = int(os.getenv('TIMELINE_INBOX_SIZE', 800))
+TIMELINE_TRIM_EVERY = int(os.getenv('TIMELINE_TRIM_EVERY', 20))
+TIMELINE_BACKFILL = int(os.getenv('TIMELINE_BACKFILL', 50))
+
+# Per-user counters (dendo_activity/counters.py): increments are buffered in-process and
+# applied every COUNTER_FLUSH_INTERVAL seconds; a flush of at least COUNTER_HOT_DELTA
+# goes to one of COUNTER_SHARDS rows. Reads are cached in COUNTER_CACHE (empty to read
+# the rows every time). 'sync' applies each increment at commit time, 'off' disables counting.
+COUNTER_MODE = os.getenv('COUNTER_MODE', 'buffered')
+COUNTER_FLUSH_INTERVAL = float(os.getenv('COUNTER_FLUSH_INTERVAL', 5.0))
+COUNTER_SHARDS = int(os.getenv('COUNTER_SHARDS', 8))
+COUNTER_HOT_DELTA = int(os.getenv('COUNTER_HOT_DELTA', 50))
+COUNTER_CACHE = os.getenv('COUNTER_CACHE', 'default')
+COUNTER_CACHE_TIMEOUT = int(os.getenv('COUNTER_CACHE_TIMEOUT', 60))
+
 
 log_status = os.getenv('log_lvl', 'INFO').upper()
 
+# Logging goes through in-memory queues drained by background listener threads
+# (dendo/log.py); request threads never wait on log I/O. The general log rotates
+# daily, the perf log by size. High-volume loggers are sampled below WARNING.
+# Test runs (`manage.py test` or pytest) log to a temporary directory, removed at
+# exit, unless LOG_DIR is set, so they never write into the checkout.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+LOG_DIR = os.getenv('LOG_DIR')
+if not LOG_DIR and TESTING:
+    LOG_DIR = tempfile.mkdtemp(prefix='dendo-logs-')
+    # Registered before dendo.log's listener shutdown, so it runs after it.
+    atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+LOG_DIR = LOG_DIR or os.path.join(BASE_DIR, 'logs')
+os.makedirs(LOG_DIR, exist_ok=True)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_FILE_BACKUPS = int(os.getenv('LOG_FILE_BACKUPS', 14))
+PERF_LOG_MAX_BYTES = int(os.getenv('PERF_LOG_MAX_BYTES', 50 * 1024 * 1024))
+PERF_LOG_BACKUPS = int(os.getenv('PERF_LOG_BACKUPS', 10))
+PERF_LOG_SAMPLE_RATE = float(os.getenv('PERF_LOG_SAMPLE_RATE', 1.0))
+DB_LOG_SAMPLE_RATE = float(os.getenv('DB_LOG_SAMPLE_RATE', 0.01))
+
+# Per-request timings (dendo/perf.py), one JSON line per request, read by `manage.py perf_report`
+PERF_LOG_ENABLED = os.getenv('PERF_LOG_ENABLED', 'true').lower() == 'true'
+PERF_LOG_FILE = os.getenv('PERF_LOG_FILE', os.path.join(LOG_DIR, 'dendo_perf.logs'))
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+
+LOGGING_CONFIG = 'dendo.log.configure'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'dendo.log.JsonFormatter',
+        }
+    },
+
+    'filters': {
+        'perf_sampling': {
+            '()': 'dendo.log.SamplingFilter',
+            'rate': PERF_LOG_SAMPLE_RATE,
+        },
+
+        'db_sampling': {
+            '()': 'dendo.log.SamplingFilter',
+            'rate': DB_LOG_SAMPLE_RATE,
+        }
+    },
+
     'handlers': {
         'stdout': {
             'class': 'logging.StreamHandler',
-            'stream': 'ext://sys.stdout'
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json'
         },
 
         'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'dendo_general.logs'),
+            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'filename': os.path.join(LOG_DIR, 'dendo_general.logs'),
             'level': log_status,
-            'maxBytes': 2 * 1024 * 1024,
-            'backupCount': 4
+            'when': 'midnight',
+            'backupCount': LOG_FILE_BACKUPS,
+            'delay': True,
+            'formatter': 'json'
+        },
+
+        'perf_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': PERF_LOG_FILE,
+            'level': 'INFO',
+            'maxBytes': PERF_LOG_MAX_BYTES,
+            'backupCount': PERF_LOG_BACKUPS,
+            'delay': True,
+            'formatter': 'json'
+        },
+
+        'queue': {
+            'class': 'dendo.log.NonBlockingQueueHandler',
+            'handlers': ['stdout', 'file'],
+            'queue': {'()': 'queue.Queue', 'maxsize': LOG_QUEUE_SIZE},
+            'respect_handler_level': True
+        },
+
+        'perf_queue': {
+            'class': 'dendo.log.NonBlockingQueueHandler',
+            'handlers': ['perf_file'],
+            'queue': {'()': 'queue.Queue', 'maxsize': LOG_QUEUE_SIZE},
+            'respect_handler_level': True
         }
     },
 
     'loggers': {
         'django': {
             'level': log_status,
-            'handlers': ['stdout', 'file']
+            'handlers': ['queue']
+        },
+
+        'django.db.backends': {
+            'filters': ['db_sampling']
+        },
+
+        'dendo_users': {
+            'level': log_status,
+            'handlers': ['queue']
+        },
+
+        'dendo.perf': {
+            'level': 'INFO',
+            'handlers': ['perf_queue'],
+            'filters': ['perf_sampling'],
+            'propagate': False
         }
     }
-}
\ No newline at end of file
+}
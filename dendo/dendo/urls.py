@@ -19,5 +19,7 @@ from django.urls import path, include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('u/', include('dendo_users.urls'))
+    path('u/', include('dendo_users.urls')),
+    path('c/', include('dendo_content.urls')),
+    path('a/', include('dendo_activity.urls')),
 ]
@@ -1,3 +1,43 @@
 from django.contrib import admin
 
+from dendo_users.pagination import EstimatedCountPaginator
+
+from .models import ActivityEvent, Follow, PullAuthor
+
 # Register your models here.
+
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'kind', 'user', 'ip']
+    list_filter = ['kind']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    ordering = ['-created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # The log is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ActivityEvent, ActivityEventAdmin)
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ['follower', 'followee', 'created_at']
+    list_select_related = ['follower', 'followee']
+    raw_id_fields = ['follower', 'followee']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+admin.site.register(Follow, FollowAdmin)
+
+
+class PullAuthorAdmin(admin.ModelAdmin):
+    list_display = ['user', 'created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+
+admin.site.register(PullAuthor, PullAuthorAdmin)
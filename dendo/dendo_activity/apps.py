@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DendoActivityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dendo_activity'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,238 @@
+"""
+Write-behind activity log.
+
+``ActivityLog.record`` builds an unsaved ``ActivityEvent`` and, once the
+surrounding transaction commits, hands it to a process-wide
+``ActivityBuffer``. A daemon thread writes the buffer with one
+``bulk_create`` when ACTIVITY_BATCH_SIZE events are waiting or every
+ACTIVITY_FLUSH_INTERVAL seconds, and the rest is written at interpreter
+exit. Request threads only append to a list. ``BackgroundFlusher`` is
+the thread part, shared with dendo_activity.counters.
+
+ACTIVITY_LOG_MODE selects the behaviour: 'buffered' (the default),
+'sync' to insert each event at commit time without a background thread,
+or 'off'.
+"""
+import atexit
+import logging
+import os
+import threading
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_started = []
+
+
+class BackgroundFlusher:
+    """
+    Daemon thread calling ``flush()`` every ``flush_interval`` seconds, or
+    as soon as ``wakeup`` is set. Started flushers are stopped, and flushed
+    one last time, at interpreter exit.
+    """
+
+    thread_name = 'flusher'
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = None
+
+    def flush(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.flush_interval)
+            self.flush()
+            close_old_connections()
+
+    def start(self):
+        if self.thread is not None:
+            return
+
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.thread_name, daemon=True)
+                self.thread.start()
+                _started.append(self)
+
+    def stop(self, timeout=5.0):
+        """Stops the thread and flushes what is left."""
+        self.stopping = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        self.flush()
+        self.stopping = False
+
+    def reset(self):
+        # In a forked worker: the parent still owns (and writes) what was
+        # buffered, and its thread and locks did not survive the fork.
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.clear()
+
+
+class ActivityBuffer(BackgroundFlusher):
+    """
+    Thread-safe list of unsaved events, written by a background thread.
+
+    Holds at most ``max_size`` events; while the database is unavailable,
+    newer events are dropped (and counted) rather than growing the process.
+    """
+
+    thread_name = 'activity-flusher'
+
+    def __init__(self, batch_size=500, flush_interval=2.0, max_size=50_000):
+        super().__init__(flush_interval)
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.dropped = 0
+        self.events = []
+
+    def add(self, event):
+        with self.lock:
+            if len(self.events) >= self.max_size:
+                self.dropped += 1
+                return False
+            self.events.append(event)
+            full = len(self.events) >= self.batch_size
+
+        if full:
+            self.wakeup.set()
+        return True
+
+    def take(self):
+        with self.lock:
+            events, self.events = self.events, []
+            self.wakeup.clear()
+        return events
+
+    def clear(self):
+        self.events = []
+
+    def requeue(self, events):
+        with self.lock:
+            room = max(self.max_size - len(self.events), 0)
+            self.dropped += max(len(events) - room, 0)
+            self.events[:0] = events[:room]
+
+    def flush(self):
+        """
+        Writes every buffered event in the calling thread and returns how
+        many were written. A batch the database rejects (an event of a user
+        deleted since) is retried row by row; batches that fail for any
+        other reason go back to the buffer.
+        """
+        events = self.take()
+        if not events:
+            return 0
+
+        try:
+            ActivityEvent.objects.bulk_create(events, batch_size=self.batch_size)
+        except IntegrityError:
+            return self.write_each(events)
+        except DatabaseError:
+            logger.exception('Could not write %s activity events, keeping them for the next flush.', len(events))
+            self.requeue(events)
+            return 0
+        return len(events)
+
+    def write_each(self, events):
+        written = 0
+        for event in events:
+            event.pk = None
+            try:
+                with transaction.atomic():
+                    event.save(force_insert=True)
+                written += 1
+            except IntegrityError:
+                self.dropped += 1
+        return written
+
+
+def get_buffer():
+    global _buffer
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityBuffer(
+                    batch_size=getattr(settings, 'ACTIVITY_BATCH_SIZE', 500),
+                    flush_interval=getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 2.0),
+                    max_size=getattr(settings, 'ACTIVITY_MAX_BUFFER', 50_000),
+                )
+    return _buffer
+
+
+def shutdown():
+    while _started:
+        _started.pop().stop()
+
+
+def _reset_after_fork():
+    global _buffer_lock
+    _buffer_lock = threading.Lock()
+    while _started:
+        _started.pop().reset()
+
+
+atexit.register(shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class ActivityLog:
+    @staticmethod
+    def mode():
+        return getattr(settings, 'ACTIVITY_LOG_MODE', 'buffered')
+
+    @staticmethod
+    def record(user, kind, request=None, **data):
+        """
+        Records ``kind`` for ``user`` once the current transaction commits;
+        events of rolled back transactions are never written.
+        """
+        if ActivityLog.mode() == 'off' or user is None or user.pk is None:
+            return
+
+        event = ActivityEvent(
+            user_id=user.pk,
+            kind=kind,
+            ip=request.META.get('REMOTE_ADDR') if request is not None else None,
+            data=data,
+            created_at=timezone.now(),
+        )
+        transaction.on_commit(partial(ActivityLog.write, event), robust=True)
+
+    @staticmethod
+    async def arecord(user, kind, request=None, **data):
+        await sync_to_async(ActivityLog.record)(user, kind, request, **data)
+
+    @staticmethod
+    def write(event):
+        if ActivityLog.mode() == 'sync':
+            event.save()
+            return
+
+        buffer = get_buffer()
+        buffer.start()
+        buffer.add(event)
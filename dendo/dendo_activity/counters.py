@@ -0,0 +1,201 @@
+"""
+Per-user counters: profile views, followers, following and posts.
+
+Increments are added to a process-wide ``CounterBuffer`` once the
+surrounding transaction commits and written every COUNTER_FLUSH_INTERVAL
+seconds by a background thread, one ``F()`` UPDATE per counter however
+many increments it coalesces. Counter rows live in their own table, so a
+popular profile never locks its CustomUsers row.
+
+A counter is one row until it gets hot: a flush carrying at least
+COUNTER_HOT_DELTA for one counter goes to a random one of COUNTER_SHARDS
+rows, so concurrent writers rarely wait on the same row lock. Reads sum
+the shards and are cached for COUNTER_CACHE_TIMEOUT seconds; values shown
+are approximate and `manage.py reconcile_counters` restores the exact
+follower, following and post counts.
+
+COUNTER_MODE is 'buffered' (the default), 'sync' to update the rows at
+commit time without a background thread, or 'off'.
+"""
+import logging
+import random
+import threading
+from collections import Counter as Deltas
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from dendo.perf import count_cache
+from dendo_content.models import Post
+
+from .buffer import BackgroundFlusher
+from .models import Counter, Follow
+
+logger = logging.getLogger(__name__)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+class CounterBuffer(BackgroundFlusher):
+    thread_name = 'counter-flusher'
+
+    def __init__(self, flush_interval=5.0):
+        super().__init__(flush_interval)
+        self.deltas = Deltas()
+
+    def add(self, user_id, name, delta=1):
+        with self.lock:
+            self.deltas[user_id, name] += delta
+
+    def take(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, Deltas()
+        return deltas
+
+    def clear(self):
+        self.deltas = Deltas()
+
+    def flush(self):
+        """
+        Applies every buffered delta in the calling thread and returns how
+        many counters were updated. Deltas that could not be written are
+        kept for the next flush.
+        """
+        deltas = self.take()
+        written = 0
+
+        for (user_id, name), delta in deltas.items():
+            if not delta:
+                continue
+            try:
+                Counters.apply(user_id, name, delta)
+            except DatabaseError:
+                logger.exception('Could not update counter %s of user %s, keeping the delta for the next flush.', name, user_id)
+                self.add(user_id, name, delta)
+            else:
+                written += 1
+        return written
+
+
+def get_buffer():
+    global _buffer
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = CounterBuffer(flush_interval=getattr(settings, 'COUNTER_FLUSH_INTERVAL', 5.0))
+    return _buffer
+
+
+class Counters:
+    PROFILE_VIEWS = 'profile_views'
+    FOLLOWERS = 'followers'
+    FOLLOWING = 'following'
+    POSTS = 'posts'
+    NAMES = (PROFILE_VIEWS, FOLLOWERS, FOLLOWING, POSTS)
+
+    KEY_PREFIX = 'dendo_activity:counters'
+
+    @staticmethod
+    def _cache():
+        alias = getattr(settings, 'COUNTER_CACHE', 'default')
+        if not alias:
+            return None
+        return caches[alias]
+
+    @classmethod
+    def _key(cls, user_id):
+        return f'{cls.KEY_PREFIX}:{user_id}'
+
+    @staticmethod
+    def mode():
+        return getattr(settings, 'COUNTER_MODE', 'buffered')
+
+    @classmethod
+    def increment(cls, user_id, name, delta=1):
+        if cls.mode() == 'off' or user_id is None:
+            return
+        transaction.on_commit(partial(cls.write, user_id, name, delta), robust=True)
+
+    @classmethod
+    def write(cls, user_id, name, delta):
+        if cls.mode() == 'sync':
+            cls.apply(user_id, name, delta)
+            return
+
+        buffer = get_buffer()
+        buffer.start()
+        buffer.add(user_id, name, delta)
+
+    @staticmethod
+    def apply(user_id, name, delta, shard=None):
+        if shard is None:
+            hot = abs(delta) >= getattr(settings, 'COUNTER_HOT_DELTA', 50)
+            shard = random.randrange(getattr(settings, 'COUNTER_SHARDS', 8)) if hot else 0
+
+        rows = Counter.objects.filter(user_id=user_id, name=name, shard=shard)
+        if rows.update(value=F('value') + delta):
+            return
+
+        try:
+            with transaction.atomic():
+                Counter.objects.create(user_id=user_id, name=name, shard=shard, value=delta)
+        except IntegrityError:
+            # Created concurrently, or the user is gone (then nothing matches).
+            rows.update(value=F('value') + delta)
+
+    @classmethod
+    def get(cls, user_id):
+        """
+        Approximate values of every counter of a user, as a dict. Cached;
+        increments of the last few seconds may be missing.
+        """
+        cache = cls._cache()
+        if cache is None:
+            return cls.stored(user_id)
+
+        values = count_cache(cache.get(cls._key(user_id)))
+        if values is None:
+            values = cls.stored(user_id)
+            cache.set(cls._key(user_id), values, getattr(settings, 'COUNTER_CACHE_TIMEOUT', 60))
+        return values
+
+    @classmethod
+    def stored(cls, user_id):
+        values = dict.fromkeys(cls.NAMES, 0)
+        rows = Counter.objects.filter(user_id=user_id).values_list('name').annotate(Sum('value')).order_by()
+        values.update(rows)
+        return values
+
+    @classmethod
+    def reconcile(cls, user_ids):
+        """
+        Recounts followers, following and posts of ``user_ids`` from the
+        Follows and Posts tables and corrects the stored values. Returns the
+        number of counters that were off.
+        """
+        exact = {
+            cls.FOLLOWERS: Follow.objects.filter(followee_id__in=user_ids).values_list('followee_id').annotate(Count('pk')).order_by(),
+            cls.FOLLOWING: Follow.objects.filter(follower_id__in=user_ids).values_list('follower_id').annotate(Count('pk')).order_by(),
+            cls.POSTS: Post.objects.filter(author_id__in=user_ids).values_list('author_id').annotate(Count('pk')).order_by(),
+        }
+        exact = {name: dict(rows) for name, rows in exact.items()}
+        stored = Counter.objects.filter(user_id__in=user_ids, name__in=list(exact)).values_list('user_id', 'name').annotate(Sum('value')).order_by()
+        stored = {(user_id, name): value for user_id, name, value in stored}
+
+        corrected = set()
+        for name, counts in exact.items():
+            for user_id in user_ids:
+                delta = counts.get(user_id, 0) - stored.get((user_id, name), 0)
+                if delta:
+                    cls.apply(user_id, name, delta, shard=0)
+                    corrected.add((user_id, name))
+
+        cache = cls._cache()
+        if cache is not None and corrected:
+            cache.delete_many([cls._key(user_id) for user_id, _ in corrected])
+        return len(corrected)
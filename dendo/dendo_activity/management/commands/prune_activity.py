@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dendo_activity.models import ActivityEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes activity events older than the retention period, oldest first, '
+        'in short batches so the table stays writable while it runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retention in days (default: ACTIVITY_RETENTION_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.ACTIVITY_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = ActivityEvent.objects.filter(created_at__lt=cutoff).order_by('created_at')
+
+        deleted = 0
+        while True:
+            pks = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            deleted += ActivityEvent.objects.filter(pk__in=pks).delete()[0]
+
+        self.stdout.write(f'Deleted {deleted} activity event(s) older than {days} day(s).')
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from dendo_activity.counters import Counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Recounts follower, following and post counters from the Follows and Posts '
+        'tables and corrects the stored values. Profile views have no source to '
+        'recount from and are left as they are.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users recounted per batch.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        checked = corrected = last_pk = 0
+
+        while True:
+            user_ids = list(users.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not user_ids:
+                break
+            corrected += Counters.reconcile(user_ids)
+            checked += len(user_ids)
+            last_pk = user_ids[-1]
+
+        self.stdout.write(f'Checked {checked} user(s), corrected {corrected} counter(s).')
@@ -1,3 +1,126 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+class ActivityEvent(models.Model):
+    """
+    One user event (login, profile edit, password change).
+
+    Rows are only ever inserted, in batches by dendo_activity.buffer, and
+    deleted by age with `manage.py prune_activity`; nothing updates them.
+    created_at is set when the event happens, not when the batch is written.
+    """
+
+    LOGIN = 'login'
+    PROFILE_EDIT = 'profile_edit'
+    PASSWORD_CHANGE = 'password_change'
+    KIND_CHOICES = [
+        (LOGIN, 'Login'),
+        (PROFILE_EDIT, 'Profile edit'),
+        (PASSWORD_CHANGE, 'Password change'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='activity', db_index=False)
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'ActivityEvents'
+        indexes = [
+            # A user's history, newest first; also serves foreign key lookups on user.
+            models.Index(fields=['user', '-created_at'], name='activity_user_idx'),
+            # Pruning walks the table oldest first.
+            models.Index(fields=['created_at'], name='activity_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} by {self.user_id} at {self.created_at}'
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='following', db_index=False)
+    followee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='followers', db_index=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'Follows'
+        constraints = [
+            # Also the index behind "who does this user follow".
+            models.UniqueConstraint(fields=['follower', 'followee'], name='follow_unique'),
+        ]
+        indexes = [
+            # Fan-out walks an author's followers in follower id order.
+            models.Index(fields=['followee', 'follower'], name='follow_followee_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} follows {self.followee_id}'
+
+
+class PullAuthor(models.Model):
+    """
+    Authors with too many followers to fan out to. Their posts are not
+    copied into inboxes; home timelines read them at request time.
+    """
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'PullAuthors'
+
+    def __str__(self):
+        return f'Pull author {self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    """
+    A post copied into one user's home timeline inbox.
+
+    created_at is the post's, so an inbox is read in feed order straight
+    from timeline_owner_idx. Post and author are plain columns without
+    database constraints: deleting a post leaves its entries behind, they
+    are skipped on read and trimmed away as the inbox grows.
+    """
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    post = models.ForeignKey('dendo_content.Post', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'TimelineEntries'
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='timeline_entry_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} in timeline of {self.owner_id}'
+
+
+class Counter(models.Model):
+    """
+    One shard of a per-user counter; the counter's value is the sum of its
+    shards. Written by dendo_activity.counters with F() updates only.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    name = models.CharField(max_length=32)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'Counters'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name', 'shard'], name='counter_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}[{self.shard}] of {self.user_id}: {self.value}'
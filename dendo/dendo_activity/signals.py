@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dendo_content.models import Post
+from dendo_users.tasks import enqueue
+
+from . import tasks  # noqa: F401 (registers the timeline tasks)
+from .counters import Counters
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        enqueue('fan_out_post', post_id=instance.pk)
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        Counters.increment(instance.author_id, Counters.POSTS)
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    Counters.increment(instance.author_id, Counters.POSTS, -1)
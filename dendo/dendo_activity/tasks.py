@@ -0,0 +1,18 @@
+from dendo_users.tasks import task
+
+from .timelines import Timeline
+
+
+@task('fan_out_post')
+def fan_out_post(post_id, after=0):
+    Timeline.fan_out(post_id, after)
+
+
+@task('backfill_timeline')
+def backfill_timeline(owner_id, author_id):
+    Timeline.backfill(owner_id, author_id)
+
+
+@task('purge_timeline')
+def purge_timeline(owner_id, author_id):
+    Timeline.purge(owner_id, author_id)
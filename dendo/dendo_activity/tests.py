@@ -1,3 +1,289 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from dendo_content.models import Post
+from dendo_users.forms import UserEditForm
+from dendo_users.utils import UserHelper
+
+from .buffer import ActivityBuffer, ActivityLog
+from .counters import CounterBuffer, Counters
+from .models import ActivityEvent, Counter, Follow, PullAuthor, TimelineEntry
+from .timelines import Timeline
 
 # Create your tests here.
+
+class ActivityTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', email='alice@example.com', password='password123')
+
+    def event(self, kind=ActivityEvent.LOGIN, **kwargs):
+        return ActivityEvent(user_id=self.user.pk, kind=kind, **kwargs)
+
+
+class ActivityBufferTest(ActivityTestCase):
+    def test_flush_writes_one_batch(self):
+        buffer = ActivityBuffer(batch_size=10, flush_interval=60)
+        for _ in range(3):
+            buffer.add(self.event())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(ActivityEvent.objects.count(), 3)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_full_batch_wakes_flusher(self):
+        buffer = ActivityBuffer(batch_size=2, flush_interval=60)
+        buffer.add(self.event())
+        self.assertFalse(buffer.wakeup.is_set())
+        buffer.add(self.event())
+        self.assertTrue(buffer.wakeup.is_set())
+
+    def test_bounded_when_database_fails(self):
+        buffer = ActivityBuffer(batch_size=10, flush_interval=60, max_size=3)
+        for _ in range(4):
+            buffer.add(self.event())
+        self.assertEqual(buffer.dropped, 1)
+
+        with mock.patch.object(ActivityEvent.objects, 'bulk_create', side_effect=DatabaseError), self.assertLogs('dendo_activity.buffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer.events), 3)
+
+        self.assertEqual(buffer.flush(), 3)
+
+    def test_rejected_batch_is_written_row_by_row(self):
+        buffer = ActivityBuffer(batch_size=10, flush_interval=60)
+        buffer.add(self.event())
+        buffer.add(self.event())
+
+        with mock.patch.object(ActivityEvent.objects, 'bulk_create', side_effect=IntegrityError):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(ActivityEvent.objects.count(), 2)
+        self.assertFalse(buffer.events)
+
+    def test_stop_writes_remaining_events(self):
+        buffer = ActivityBuffer(batch_size=10, flush_interval=60)
+        buffer.add(self.event())
+        buffer.stop()
+        self.assertEqual(ActivityEvent.objects.count(), 1)
+
+
+@override_settings(ACTIVITY_LOG_MODE='sync')
+class ActivityLogTest(ActivityTestCase):
+    def test_written_after_commit_only(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ActivityLog.record(self.user, ActivityEvent.LOGIN)
+        self.assertFalse(ActivityEvent.objects.exists())
+
+        callbacks[0]()
+        self.assertTrue(ActivityEvent.objects.filter(user=self.user, kind=ActivityEvent.LOGIN).exists())
+
+    def test_buffered_mode_does_not_write_in_request(self):
+        buffer = ActivityBuffer(batch_size=10, flush_interval=60)
+        with override_settings(ACTIVITY_LOG_MODE='buffered'), mock.patch('dendo_activity.buffer.get_buffer', return_value=buffer), \
+                mock.patch.object(buffer, 'start'), self.assertNumQueries(0), self.captureOnCommitCallbacks(execute=True):
+            ActivityLog.record(self.user, ActivityEvent.LOGIN)
+        self.assertEqual(len(buffer.events), 1)
+
+    def test_login_is_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dendo_users:login_page'), {'username_or_email': 'alice', 'password': 'password123'})
+
+        event = ActivityEvent.objects.get(kind=ActivityEvent.LOGIN)
+        self.assertEqual(event.user_id, self.user.pk)
+        self.assertEqual(event.ip, '127.0.0.1')
+
+    def test_profile_edit_and_password_change_are_recorded(self):
+        form = UserEditForm(data={'bio': 'New bio'}, user=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+            UserHelper.update_password(self.user, 'newpassword123')
+
+        events = dict(ActivityEvent.objects.values_list('kind', 'data'))
+        self.assertEqual(events[ActivityEvent.PROFILE_EDIT], {'fields': ['bio']})
+        self.assertIn(ActivityEvent.PASSWORD_CHANGE, events)
+
+    def test_off(self):
+        with override_settings(ACTIVITY_LOG_MODE='off'), self.captureOnCommitCallbacks(execute=True):
+            ActivityLog.record(self.user, ActivityEvent.LOGIN)
+        self.assertFalse(ActivityEvent.objects.exists())
+
+
+class PruneActivityTest(ActivityTestCase):
+    def test_deletes_only_expired_events(self):
+        now = timezone.now()
+        ActivityEvent.objects.bulk_create([
+            self.event(created_at=now - timedelta(days=days)) for days in (1, 40, 100, 200)
+        ])
+
+        call_command('prune_activity', days=30, batch_size=1, stdout=StringIO())
+        self.assertEqual(ActivityEvent.objects.count(), 1)
+
+
+@override_settings(TASKS_ALWAYS_EAGER=True, COUNTER_MODE='sync', TIMELINE_FANOUT_BATCH=2, TIMELINE_PULL_THRESHOLD=4, TIMELINE_TRIM_EVERY=1)
+class TimelineTest(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.author = user_model.objects.create_user(username='author', email='author@example.com', password='password123')
+        self.readers = [
+            user_model.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com', password='password123')
+            for i in range(3)
+        ]
+
+    def post(self, author, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=author, body=body)
+
+    def follow(self, follower, followee):
+        with self.captureOnCommitCallbacks(execute=True):
+            Timeline.follow(follower, followee)
+
+    def bodies(self, user, limit=20):
+        seen, cursor = [], None
+        while True:
+            posts, cursor = Timeline.home(user, cursor, limit)
+            seen += [post.body for post in posts]
+            if cursor is None:
+                return seen
+
+    def test_fan_out_reaches_every_follower_in_batches(self):
+        for reader in self.readers:
+            self.follow(reader, self.author)
+        self.post(self.author, 'hello')
+
+        for reader in self.readers:
+            self.assertEqual(self.bodies(reader), ['hello'])
+        self.assertEqual(self.bodies(self.author), ['hello'])
+        self.assertEqual(TimelineEntry.objects.filter(post__body='hello').count(), 4)
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        self.post(self.author, 'older')
+        reader = self.readers[0]
+        self.follow(reader, self.author)
+        self.assertEqual(self.bodies(reader), ['older'])
+
+        self.assertEqual(Counters.stored(self.author.pk)[Counters.FOLLOWERS], 1)
+        self.assertEqual(Counters.stored(reader.pk)[Counters.FOLLOWING], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Timeline.unfollow(reader, self.author)
+        self.assertEqual(self.bodies(reader), [])
+        self.assertEqual(Counters.stored(self.author.pk)[Counters.FOLLOWERS], 0)
+
+    def test_large_accounts_are_merged_at_read_time(self):
+        user_model = get_user_model()
+        extra = user_model.objects.create_user(username='extra', email='extra@example.com', password='password123')
+        for reader in self.readers + [extra]:
+            self.follow(reader, self.author)
+
+        friend = self.readers[1]
+        self.follow(self.readers[0], friend)
+        self.post(friend, 'from friend')
+        self.post(self.author, 'from author')
+
+        self.assertTrue(PullAuthor.objects.filter(user=self.author).exists())
+        self.assertFalse(TimelineEntry.objects.filter(post__body='from author', owner=self.readers[0]).exists())
+        self.assertEqual(self.bodies(self.readers[0], limit=1), ['from author', 'from friend'])
+
+    def test_home_reads_one_inbox_range(self):
+        reader = self.readers[0]
+        self.follow(reader, self.author)
+        for i in range(5):
+            self.post(self.author, f'post {i}')
+
+        # inbox range, followed pull authors, posts by id
+        with self.assertNumQueries(3):
+            posts, cursor = Timeline.home(reader, limit=2)
+        self.assertEqual([post.body for post in posts], ['post 4', 'post 3'])
+        self.assertIsNotNone(cursor)
+
+    @override_settings(TIMELINE_INBOX_SIZE=2)
+    def test_inbox_is_trimmed(self):
+        reader = self.readers[0]
+        self.follow(reader, self.author)
+        for i in range(4):
+            self.post(self.author, f'post {i}')
+
+        self.assertEqual(self.bodies(reader), ['post 3', 'post 2'])
+
+    def test_views(self):
+        reader = self.readers[0]
+        self.client.force_login(reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('dendo_activity:follow', kwargs={'username': 'author'}))
+        self.assertEqual(response.json(), {'username': 'author', 'following': True})
+        self.post(self.author, 'hello')
+
+        response = self.client.get(reverse('dendo_activity:home_timeline'))
+        self.assertEqual([card['body'] for card in response.json()['results']], ['hello'])
+
+        response = self.client.post(reverse('dendo_activity:follow', kwargs={'username': 'reader0'}))
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(COUNTER_MODE='sync', COUNTER_SHARDS=4, COUNTER_HOT_DELTA=10)
+class CounterTest(ActivityTestCase):
+    def test_buffer_coalesces_increments(self):
+        buffer = CounterBuffer(flush_interval=60)
+        for _ in range(5):
+            buffer.add(self.user.pk, Counters.PROFILE_VIEWS)
+        buffer.add(self.user.pk, Counters.POSTS)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(Counter.objects.get(user=self.user, name=Counters.PROFILE_VIEWS).value, 5)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_hot_counters_are_sharded(self):
+        for _ in range(20):
+            Counters.apply(self.user.pk, Counters.PROFILE_VIEWS, 10)
+        Counters.apply(self.user.pk, Counters.POSTS, 1)
+
+        self.assertGreater(Counter.objects.filter(name=Counters.PROFILE_VIEWS).count(), 1)
+        self.assertEqual(Counter.objects.get(name=Counters.POSTS).shard, 0)
+        self.assertEqual(Counters.stored(self.user.pk)[Counters.PROFILE_VIEWS], 200)
+
+    def test_reads_are_cached(self):
+        self.assertEqual(Counters.get(self.user.pk)[Counters.PROFILE_VIEWS], 0)
+        Counters.apply(self.user.pk, Counters.PROFILE_VIEWS, 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(Counters.get(self.user.pk)[Counters.PROFILE_VIEWS], 0)
+
+    def test_profile_views_are_counted(self):
+        url = reverse('dendo_users:user_page', kwargs={'username': 'alice'})
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(url)
+
+        self.assertEqual(Counters.stored(self.user.pk)[Counters.PROFILE_VIEWS], 2)
+
+    def test_profile_page_shows_counts(self):
+        cache.clear()
+        Counters.apply(self.user.pk, Counters.FOLLOWERS, 3)
+        response = self.client.get(reverse('dendo_users:user_page', kwargs={'username': 'alice'}))
+        self.assertContains(response, '3 followers')
+
+    def test_reconcile_restores_exact_counts(self):
+        bob = get_user_model().objects.create_user(username='bob', email='bob@example.com', password='password123')
+        Follow.objects.create(follower=bob, followee=self.user)
+        Post.objects.create(author=self.user, body='hello')
+        Counters.apply(self.user.pk, Counters.FOLLOWERS, 5)
+        Counters.apply(self.user.pk, Counters.PROFILE_VIEWS, 7)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('corrected 3 counter(s)', out.getvalue())
+
+        self.assertEqual(Counters.stored(self.user.pk), {
+            Counters.PROFILE_VIEWS: 7, Counters.FOLLOWERS: 1, Counters.FOLLOWING: 0, Counters.POSTS: 1,
+        })
+        self.assertEqual(Counters.stored(bob.pk)[Counters.FOLLOWING], 1)
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db.models import Q
+
+from dendo_content.feeds import Feed, encode_key
+from dendo_content.models import Post
+from dendo_users.tasks import enqueue
+
+from .counters import Counters
+from .models import Follow, PullAuthor, TimelineEntry
+
+
+class Timeline:
+    """
+    Home timelines: posts by the accounts a user follows, newest first.
+
+    A new post is copied into each follower's inbox (TimelineEntry) by
+    background tasks, TIMELINE_FANOUT_BATCH followers per task. Authors
+    with TIMELINE_PULL_THRESHOLD followers or more become PullAuthors and
+    are skipped by fan-out; their posts are merged in when the timeline is
+    read. Inboxes are trimmed to about TIMELINE_INBOX_SIZE entries.
+
+    Reading a page is one range scan of the reader's inbox plus one query
+    for followed pull authors, however many accounts the reader follows.
+    """
+
+    @staticmethod
+    def _setting(name, default):
+        return getattr(settings, name, default)
+
+    @staticmethod
+    def follow(follower, followee):
+        if follower.pk == followee.pk:
+            raise ValueError('Users cannot follow themselves.')
+
+        _, created = Follow.objects.get_or_create(follower=follower, followee=followee)
+        if created:
+            enqueue('backfill_timeline', owner_id=follower.pk, author_id=followee.pk)
+            Counters.increment(followee.pk, Counters.FOLLOWERS)
+            Counters.increment(follower.pk, Counters.FOLLOWING)
+        return created
+
+    @staticmethod
+    def unfollow(follower, followee):
+        deleted, _ = Follow.objects.filter(follower=follower, followee=followee).delete()
+        if deleted:
+            enqueue('purge_timeline', owner_id=follower.pk, author_id=followee.pk)
+            Counters.increment(followee.pk, Counters.FOLLOWERS, -1)
+            Counters.increment(follower.pk, Counters.FOLLOWING, -1)
+        return bool(deleted)
+
+    @classmethod
+    def is_pull_author(cls, author_id):
+        """
+        True for authors read at request time. An author is promoted once
+        their follower count reaches the threshold; counting stops there,
+        so the check stays cheap for very large accounts.
+        """
+        if PullAuthor.objects.filter(pk=author_id).exists():
+            return True
+
+        threshold = cls._setting('TIMELINE_PULL_THRESHOLD', 10_000)
+        if Follow.objects.filter(followee_id=author_id)[:threshold].count() < threshold:
+            return False
+
+        PullAuthor.objects.get_or_create(user_id=author_id)
+        return True
+
+    @classmethod
+    def fan_out(cls, post_id, after=0):
+        """
+        Copies a post into the inboxes of one batch of its author's
+        followers, those with ids above ``after``, and queues the next batch.
+        """
+        post = Post.objects.filter(pk=post_id).values('author_id', 'created_at').first()
+        if post is None:
+            return
+
+        author_id = post['author_id']
+        if after == 0:
+            # Authors always see their own posts.
+            cls.deliver(post_id, author_id, post['created_at'], [author_id])
+            if cls.is_pull_author(author_id):
+                return
+
+        batch_size = cls._setting('TIMELINE_FANOUT_BATCH', 1000)
+        followers = list(
+            Follow.objects.filter(followee_id=author_id, follower_id__gt=after)
+            .order_by('follower_id')
+            .values_list('follower_id', flat=True)[:batch_size]
+        )
+        if not followers:
+            return
+
+        cls.deliver(post_id, author_id, post['created_at'], followers)
+        if len(followers) == batch_size:
+            enqueue('fan_out_post', post_id=post_id, after=followers[-1])
+
+    @classmethod
+    def deliver(cls, post_id, author_id, created_at, owner_ids):
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(owner_id=owner_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for owner_id in owner_ids
+        ], ignore_conflicts=True)
+
+        # Each inbox is trimmed on roughly one delivery in TIMELINE_TRIM_EVERY,
+        # spread over owners so a batch only trims a slice of its inboxes.
+        trim_every = cls._setting('TIMELINE_TRIM_EVERY', 20)
+        cls.trim([owner_id for owner_id in owner_ids if (owner_id + post_id) % trim_every == 0])
+
+    @classmethod
+    def trim(cls, owner_ids):
+        size = cls._setting('TIMELINE_INBOX_SIZE', 800)
+        for owner_id in owner_ids:
+            inbox = TimelineEntry.objects.filter(owner_id=owner_id)
+            edge = inbox.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[size:size + 1].first()
+            if edge is None:
+                continue
+
+            created_at, post_id = edge
+            inbox.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lte=post_id)).delete()
+
+    @classmethod
+    def backfill(cls, owner_id, author_id):
+        """Copies an author's latest posts into a new follower's inbox."""
+        if not Follow.objects.filter(follower_id=owner_id, followee_id=author_id).exists():
+            return
+        if cls.is_pull_author(author_id):
+            return
+
+        count = cls._setting('TIMELINE_BACKFILL', 50)
+        posts = Post.objects.filter(author_id=author_id).order_by('-created_at', '-id').values_list('id', 'created_at')[:count]
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(owner_id=owner_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for post_id, created_at in posts
+        ], ignore_conflicts=True)
+        cls.trim([owner_id])
+
+    @staticmethod
+    def purge(owner_id, author_id):
+        if Follow.objects.filter(follower_id=owner_id, followee_id=author_id).exists():
+            return
+        TimelineEntry.objects.filter(owner_id=owner_id, author_id=author_id).delete()
+
+    @staticmethod
+    def pull_authors(user):
+        return list(
+            Follow.objects.filter(follower=user, followee_id__in=PullAuthor.objects.values('user_id'))
+            .values_list('followee_id', flat=True)
+        )
+
+    @classmethod
+    def home(cls, user, cursor=None, limit=Feed.PAGE_SIZE):
+        """
+        Returns one page of the user's home timeline and the cursor of the
+        next page, in the same format as Feed.page.
+        """
+        limit = Feed.clamp(limit)
+
+        keys = set(
+            Feed.after(TimelineEntry.objects.filter(owner=user), cursor, 'post_id')
+            .order_by('-created_at', '-post_id')
+            .values_list('created_at', 'post_id')[:limit + 1]
+        )
+
+        pulled = cls.pull_authors(user)
+        if pulled:
+            keys.update(
+                Feed.after(Post.objects.filter(author_id__in=pulled), cursor)
+                .order_by('-created_at', '-id')
+                .values_list('created_at', 'id')[:limit + 1]
+            )
+
+        keys = sorted(keys, reverse=True)
+        page = keys[:limit]
+        next_cursor = encode_key(*page[-1]) if len(keys) > limit else None
+
+        posts = Feed.base_queryset().in_bulk([pk for _, pk in page])
+        return [posts[pk] for _, pk in page if pk in posts], next_cursor
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from .views import FollowView, HomeTimelineView
+
+app_name = 'dendo_activity'
+
+urlpatterns = [
+    path('timeline/', HomeTimelineView.as_view(), name='home_timeline'),
+    path('follow/<str:username>/', FollowView.as_view(), name='follow'),
+    path('unfollow/<str:username>/', FollowView.as_view(follow=False), name='unfollow'),
+]
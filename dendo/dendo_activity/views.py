@@ -1,3 +1,55 @@
-from django.shortcuts import render
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
+from django.views.generic import View
+
+from dendo.routers import replica_reads
+from dendo_content.feeds import Feed, InvalidCursor
+from dendo_users.utils import UserHelper
+
+from .timelines import Timeline
 
 # Create your views here.
+
+class FollowView(LoginRequiredMixin, View):
+    """
+    POST follows (or with ``follow=False``, unfollows) the user named in
+    the URL and returns the resulting state as JSON.
+    """
+
+    follow = True
+
+    def post(self, request, *args, **kwargs):
+        followee = UserHelper.get_user(kwargs['username'])
+        if followee is None:
+            raise Http404('User not found.')
+
+        if self.follow:
+            try:
+                Timeline.follow(request.user, followee)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+        else:
+            Timeline.unfollow(request.user, followee)
+
+        return JsonResponse({'username': followee.username, 'following': self.follow})
+
+
+class HomeTimelineView(LoginRequiredMixin, View):
+    """
+    The signed-in user's home timeline as JSON, paged like FeedView with
+    ``?cursor=<token>&limit=<n>``.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.GET.get('limit', Feed.PAGE_SIZE))
+        except ValueError:
+            limit = Feed.PAGE_SIZE
+
+        with replica_reads():
+            try:
+                posts, next_cursor = Timeline.home(request.user, request.GET.get('cursor'), limit)
+            except InvalidCursor as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse({'results': [Feed.card(post) for post in posts], 'next': next_cursor})
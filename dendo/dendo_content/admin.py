@@ -1,3 +1,14 @@
 from django.contrib import admin
 
+from .models import Post
+
 # Register your models here.
+
+class PostAdmin(admin.ModelAdmin):
+    list_display = ['id', 'author', 'created_at']
+    list_select_related = ['author']
+    raw_id_fields = ['author']
+    readonly_fields = ['created_at', 'updated_at']
+    show_full_result_count = False
+
+admin.site.register(Post, PostAdmin)
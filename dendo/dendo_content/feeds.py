@@ -0,0 +1,117 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Post
+
+AUTHOR_FIELDS = ['author__id', 'author__username', 'author__is_verified', 'author__avatar', 'author__avatar_renditions']
+
+# Largest id a cursor may carry (a signed 64-bit column).
+MAX_CURSOR_PK = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(post):
+    """
+    Opaque token pointing just after ``post`` in a newest-first feed. It
+    holds the post's (created_at, id), so it stays valid however many
+    posts are inserted before or after it.
+    """
+    return encode_key(post.created_at, post.pk)
+
+
+def encode_key(created_at, pk):
+    payload = json.dumps([created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, pk = json.loads(payload)
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, ValueError, TypeError, OverflowError) as e:
+        raise InvalidCursor('Invalid feed cursor.') from e
+
+    if not 0 < pk <= MAX_CURSOR_PK or not timezone.is_aware(created_at):
+        raise InvalidCursor('Invalid feed cursor.')
+    return created_at, pk
+
+
+class Feed:
+    """
+    Newest-first post listings with keyset pagination.
+
+    A page is ``created_at <= t AND (created_at < t OR id < pk)`` ordered by
+    (created_at, id) descending with a LIMIT, which the feed indexes answer
+    with one range scan at any depth; there is no OFFSET and no COUNT.
+    Authors are joined in and limited to the profile card columns.
+    """
+
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
+    @staticmethod
+    def base_queryset():
+        return Post.objects.select_related('author').only('id', 'body', 'created_at', *AUTHOR_FIELDS)
+
+    @classmethod
+    def global_feed(cls):
+        return cls.base_queryset()
+
+    @classmethod
+    def author_feed(cls, author):
+        return cls.base_queryset().filter(author=author)
+
+    @classmethod
+    def clamp(cls, limit):
+        return max(1, min(limit, cls.MAX_PAGE_SIZE))
+
+    @staticmethod
+    def after(queryset, cursor, pk_field='id'):
+        """
+        Narrows ``queryset`` to the rows after ``cursor``, for any model
+        ordered by (created_at, ``pk_field``) descending.
+        """
+        if not cursor:
+            return queryset
+
+        created_at, pk = decode_cursor(cursor)
+        return queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(**{f'{pk_field}__lt': pk})
+        )
+
+    @classmethod
+    def page(cls, queryset, cursor=None, limit=PAGE_SIZE):
+        """
+        Returns the posts after ``cursor`` and the cursor of the following
+        page (None on the last page). Raises InvalidCursor for a malformed
+        token.
+        """
+        limit = cls.clamp(limit)
+        queryset = cls.after(queryset, cursor)
+
+        posts = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+        next_cursor = encode_cursor(posts[limit - 1]) if len(posts) > limit else None
+        return posts[:limit], next_cursor
+
+    @staticmethod
+    def card(post):
+        author = post.author
+        return {
+            'id': post.pk,
+            'body': post.body,
+            'created_at': post.created_at.isoformat(),
+            'author': {
+                'username': author.username,
+                'is_verified': author.is_verified,
+                'avatar_url': author.get_rendition_url('avatar', 'sm'),
+            },
+        }
@@ -1,3 +1,30 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+class Post(models.Model):
+    """
+    A piece of content posted by a user.
+
+    Feeds read posts newest first, ordered by (created_at, id) so rows with
+    the same timestamp still have a stable order; both feed indexes follow
+    that order.
+    """
+
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts', db_index=False)
+    body = models.TextField(max_length=2000)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'Posts'
+        indexes = [
+            # Also serves foreign key lookups on author, hence db_index=False above.
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_feed_idx'),
+            models.Index(fields=['-created_at', '-id'], name='post_global_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.pk} by {self.author_id} at {self.created_at}'
@@ -1,3 +1,92 @@
+import base64
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .feeds import Feed, InvalidCursor, decode_cursor
+from .models import Post
 
 # Create your tests here.
+
+class FeedTest(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.alice = user_model.objects.create_user(username='alice', email='alice@example.com', password='password123')
+        self.bob = user_model.objects.create_user(username='bob', email='bob@example.com', password='password123')
+
+        now = timezone.now()
+        # Two posts share a timestamp so the id tie-breaker is exercised.
+        self.posts = [
+            Post.objects.create(author=self.alice if i % 2 else self.bob, body=f'post {i}', created_at=now - timedelta(minutes=i // 2 * 2))
+            for i in range(6)
+        ]
+
+    def collect(self, queryset, limit):
+        seen, cursor = [], None
+        while True:
+            posts, cursor = Feed.page(queryset, cursor, limit)
+            seen += [post.body for post in posts]
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_feed_in_order(self):
+        expected = [post.body for post in sorted(self.posts, key=lambda post: (post.created_at, post.pk), reverse=True)]
+        self.assertEqual(self.collect(Feed.global_feed(), 2), expected)
+
+    def test_cursor_is_stable_when_posts_are_inserted(self):
+        first_page, cursor = Feed.page(Feed.global_feed(), None, 2)
+        Post.objects.create(author=self.alice, body='newest')
+
+        second_page, _ = Feed.page(Feed.global_feed(), cursor, 2)
+        self.assertNotIn('newest', [post.body for post in second_page])
+        self.assertFalse({post.pk for post in first_page} & {post.pk for post in second_page})
+
+    def test_page_is_one_query_without_offset(self):
+        _, cursor = Feed.page(Feed.global_feed(), None, 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            posts, _ = Feed.page(Feed.author_feed(self.alice), cursor, 2)
+            cards = [Feed.card(post) for post in posts]
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+        self.assertEqual({card['author']['username'] for card in cards}, {'alice'})
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+
+        response = self.client.get(reverse('dendo_content:global_feed'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_out_of_range_cursor(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+        for payload in (
+            '["2020-01-01T00:00:00+00:00",Infinity]',
+            f'["2020-01-01T00:00:00+00:00",{2 ** 64}]',
+            '["2020-01-01T00:00:00+00:00",0]',
+            '["2020-01-01T00:00:00",1]',
+        ):
+            with self.subTest(payload=payload):
+                response = self.client.get(reverse('dendo_content:global_feed'), {'cursor': token(payload)})
+                self.assertEqual(response.status_code, 400)
+
+    def test_user_feed_view(self):
+        response = self.client.get(reverse('dendo_content:user_feed', kwargs={'username': 'BOB'}), {'limit': 2})
+        data = response.json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['author']['username'], 'bob')
+        self.assertIsNotNone(data['next'])
+
+        response = self.client.get(reverse('dendo_content:user_feed', kwargs={'username': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(reverse('dendo_content:user_feed', kwargs={'username': 'bob@example.com'}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .views import FeedView
+
+app_name = 'dendo_content'
+
+urlpatterns = [
+    path('feed/', FeedView.as_view(), name='global_feed'),
+    path('feed/<str:username>/', FeedView.as_view(), name='user_feed'),
+]
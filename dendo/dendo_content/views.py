@@ -1,3 +1,44 @@
-from django.shortcuts import render
+from django.http import Http404, JsonResponse
+from django.views.generic import View
+
+from dendo.routers import replica_reads
+from dendo_users.identity import IdentityResolver
+from dendo_users.utils import UserHelper
+
+from .feeds import Feed, InvalidCursor
 
 # Create your views here.
+
+class FeedView(View):
+    """
+    Newest-first posts as JSON: ``?cursor=<token>&limit=<n>`` returns post
+    cards and the cursor of the next page. Without ``username`` in the URL
+    the feed covers every author.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.GET.get('limit', Feed.PAGE_SIZE))
+        except ValueError:
+            limit = Feed.PAGE_SIZE
+
+        with replica_reads():
+            queryset = self.get_queryset()
+            try:
+                posts, next_cursor = Feed.page(queryset, request.GET.get('cursor'), limit)
+            except InvalidCursor as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse({'results': [Feed.card(post) for post in posts], 'next': next_cursor})
+
+    def get_queryset(self):
+        username = self.kwargs.get('username')
+        if username is None:
+            return Feed.global_feed()
+
+        # Usernames only: resolving emails here would tell anyone whether an
+        # address is registered.
+        author = None if IdentityResolver.is_email(username) else UserHelper.get_user(username)
+        if author is None:
+            raise Http404('User not found.')
+        return Feed.author_feed(author)
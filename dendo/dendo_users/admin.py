@@ -1,13 +1,73 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
 from django.contrib.auth.admin import UserAdmin
 
-from .models import CustomUser
+from dendo.routers import replica_reads
+
+from .models import CustomUser, QueuedTask
+from .pagination import EstimatedCountPaginator
+from .search import UserSearch
 
 # Register your models here.
 
+AFTER_VAR = 'after'
+
+
+class CustomUserChangeList(ChangeList):
+    """
+    Changelist that pages by username instead of OFFSET.
+
+    With the default ordering each page is ``username > <last username of
+    the previous page>``, one probe of the username index however deep the
+    page. Sorting by another column falls back to numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = request.GET.get(AFTER_VAR)
+        self.next_after = None
+        self.keyset = False
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).for_admin_list()
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.after:
+            queryset = queryset.filter(username__gt=self.after)
+        rows = list(queryset[:self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[:self.list_per_page]
+            self.next_after = rows[-1].username
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.result_list = rows
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.after or self.next_after)
+        self.keyset = True
+
+        self.count_is_capped = bool(self.queryset.query.where) and self.result_count >= self.paginator.count_cap
+        self.first_page_url = self.get_query_string(remove=[AFTER_VAR, PAGE_VAR])
+        self.next_page_url = self.get_query_string({AFTER_VAR: self.next_after}, [PAGE_VAR])
+
+
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
     list_per_page = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ('User Info', {'fields': ('username', 'email', 'password', 'avatar', 'banner', 'is_verified')}),
@@ -38,7 +98,30 @@ class CustomUserAdmin(UserAdmin):
     readonly_fields = ['date_joined', 'updated_at', 'last_login']
 
     search_fields = ['username', 'email']
+    search_help_text = 'Starts with the username or email (case-insensitive).'
+
+    ordering = ['username']
+
+    def get_changelist(self, request, **kwargs):
+        return CustomUserChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return UserSearch.prefix(queryset, search_term), False
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+
+        with replica_reads():
+            return super().changelist_view(request, extra_context)
+
+admin.site.register(CustomUser, CustomUserAdmin)
 
-    ordering = ['username', 'last_login']
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created_at', 'locked_at', 'last_error']
 
-admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(QueuedTask, QueuedTaskAdmin)
\ No newline at end of file
@@ -6,4 +6,6 @@ class DendoUsersConfig(AppConfig):
     name = 'dendo_users'
 
     def ready(self):
-        from . import signals
\ No newline at end of file
+        from . import checks, signals
+        from .last_login import LastLogin
+        LastLogin.install()
\ No newline at end of file
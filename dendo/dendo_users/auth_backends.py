@@ -1,14 +1,41 @@
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
 
+from .throttling import LoginThrottle
+from .user_cache import SessionUserCache
 from .utils import UserHelper
 
 class UsernameOrEmailBackend(ModelBackend):
 
     def authenticate(self, request, username=None, password=None):
+        ip = LoginThrottle.client_ip(request)
+        if LoginThrottle.check(ip, username):
+            # Stops authenticate() from trying the remaining backends.
+            raise PermissionDenied
+
         try:
             user = UserHelper.get_user(username)
             if user and user.check_password(password):
+                LoginThrottle.reset(username)
                 return user
-            return None
         except Exception as e:
-            return None
\ No newline at end of file
+            pass
+
+        LoginThrottle.register_failure(ip, username)
+        return None
+
+    def get_user(self, user_id):
+        user = SessionUserCache.get(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                SessionUserCache.set(user)
+        return user
+
+    async def aget_user(self, user_id):
+        user = await SessionUserCache.aget(user_id)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await SessionUserCache.aset(user)
+        return user
@@ -0,0 +1,28 @@
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError
+
+
+@register(Tags.database)
+def check_usernames(app_configs, databases=None, **kwargs):
+    """
+    Usernames with '@' predate UsernameValidator. They are looked up as
+    emails, so their owners can only sign in with their email address.
+    Runs with `manage.py check --database default` and before migrate.
+    """
+    from .models import CustomUser
+
+    warnings = []
+    for alias in databases or []:
+        try:
+            names = list(CustomUser.objects.using(alias).filter(username__contains='@').values_list('username', flat=True)[:10])
+        except DatabaseError:
+            continue
+
+        if names:
+            warnings.append(Warning(
+                f"Usernames containing '@' in database '{alias}': {', '.join(names)}.",
+                hint="Rename them; identifiers containing '@' are looked up as emails.",
+                obj=CustomUser,
+                id='dendo_users.W001',
+            ))
+    return warnings
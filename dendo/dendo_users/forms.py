@@ -1,10 +1,18 @@
-import re
+from functools import partial
 
 from django import forms
-from django.contrib.auth.hashers import check_password
 from django.core.validators import MinLengthValidator
 
+from dendo.routers import replica_reads
+from dendo_activity.buffer import ActivityLog
+from dendo_activity.models import ActivityEvent
+
+from .hashing import check_password
+from .identity import IdentityResolver
+from .images import ImagePipeline
 from .models import CustomUser
+from .tasks import enqueue
+from .throttling import LoginThrottle
 from .utils import UserHelper
 
 class SignUpForm(forms.Form):
@@ -36,10 +44,11 @@ class SignUpForm(forms.Form):
     def clean_username(self):
         username = self.cleaned_data.get('username')
 
-        if re.match(r'^[\w\.-]+@[\w\.-]+\.[a-zA-z]{2,}$', username.strip()):
-            raise forms.ValidationError("Username cannot be an email address.")
+        if IdentityResolver.is_email(username):
+            raise forms.ValidationError("Username cannot contain '@'.")
 
-        user = UserHelper.get_user(username)
+        with replica_reads():
+            user = UserHelper.get_user(username)
         if user:
             raise forms.ValidationError('That username is already taken')
 
@@ -47,7 +56,8 @@ class SignUpForm(forms.Form):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        user = UserHelper.get_user(email)
+        with replica_reads():
+            user = UserHelper.get_user(email)
         if user:
             raise forms.ValidationError('Email is already registered. Try logging in instead.')
         
@@ -99,13 +109,13 @@ class UserEditForm(forms.ModelForm):
 
         if username:
 
-            if re.match(r'^[\w\.-]+@[\w\.-]+\.[a-zA-Z]{2,}$', username.strip()):
-                raise forms.ValidationError("Username cannot be an email address.")
+            if IdentityResolver.is_email(username):
+                raise forms.ValidationError("Username cannot contain '@'.")
 
             elif username == self.user.username:
                 raise forms.ValidationError('This is already your current username.')
             
-            elif UserHelper.get_user(username):
+            elif UserHelper.get_user(username) not in (None, self.user):
                 raise forms.ValidationError('Username is already taken. Please choose another one.')
 
         return username
@@ -114,7 +124,7 @@ class UserEditForm(forms.ModelForm):
         user_profile = self.user
         if user_profile is None:
             raise ValueError("User instance must be provided to save the form.")
-        data_changed = 0
+        assigned = []
 
         for field in self.fields:
             field_value = self.cleaned_data.get(field)
@@ -122,19 +132,39 @@ class UserEditForm(forms.ModelForm):
             if field_value in [None, '']:
                 continue
 
-            elif field in ['avatar', 'banner'] and field in self.files:
-                current_image = getattr(user_profile, field)
-                if current_image:
-                    current_image.delete(save=False)
-
             setattr(user_profile, field, field_value)
-            data_changed += 1
+            assigned.append(field)
+
+        # Only fields whose value actually differs count; save() writes just
+        # those columns, and nothing at all when the list is empty.
+        changed = user_profile.changed_fields()
+        data_changed = [field for field in assigned if changed is None or field in changed]
+
+        stale_files = []
+        new_images = [field for field in ['avatar', 'banner'] if field in data_changed and field in self.files]
+        for field in new_images:
+            stale_files += ImagePipeline.replaced(user_profile, field)
+
+        if not commit:
+            # Like ModelForm.save_m2m: the caller saves the user, then calls
+            # save_images() to delete the replaced files and render the new ones.
+            self.save_images = partial(self._queue_image_tasks, user_profile, stale_files, new_images)
+            return user_profile
 
-        if commit and data_changed > 0:
+        if data_changed:
             user_profile.save()
+            ActivityLog.record(user_profile, ActivityEvent.PROFILE_EDIT, fields=data_changed)
+            self._queue_image_tasks(user_profile, stale_files, new_images)
         
         return user_profile
 
+    @staticmethod
+    def _queue_image_tasks(user_profile, stale_files, new_images):
+        if stale_files:
+            enqueue('delete_files', names=stale_files)
+        for field in new_images:
+            enqueue('process_user_image', user_id=user_profile.pk, field=field, name=getattr(user_profile, field).name)
+
 class PasswordUpdateForm(forms.Form):
     """
         Form for updating a user's password.
@@ -151,6 +181,7 @@ class PasswordUpdateForm(forms.Form):
         self.password_hash = kwargs.pop('current_password_hash', None)
         if self.password_hash is None:
             raise ValueError('User password is required for this form.')
+        self.old_password_verified = False
         super().__init__(*args, **kwargs)
 
     old_password = forms.CharField(widget=forms.PasswordInput(attrs={'placeholder': 'Old Password'}))
@@ -165,13 +196,20 @@ class PasswordUpdateForm(forms.Form):
         if old_password_input:
             if not check_password(old_password_input, self.password_hash):
                 raise forms.ValidationError('Old password is incorrect.')
+            self.old_password_verified = True
         return old_password_input
             
     def clean_new_password(self):
         new_password_input = self.cleaned_data.get('new_password')
 
         if new_password_input :
-            if check_password(new_password_input , self.password_hash):
+            # Once the old password matched the hash, comparing plain strings
+            # gives the same answer without paying for a second hash.
+            if self.old_password_verified:
+                same_password = new_password_input == self.cleaned_data['old_password']
+            else:
+                same_password = check_password(new_password_input, self.password_hash)
+            if same_password:
                 raise forms.ValidationError('New password cannot be the same as old password.')
         return new_password_input
 
@@ -182,21 +220,43 @@ class LogInForm(forms.Form):
         Fields:
             - username_or_email
             - password
+
+        The authenticated user is available through get_user() once the
+        form is valid, so the password is only verified once per login.
+
+        Internal parameters (passed to form):
+            - request (optional, enables per-IP throttling)
     """
     username_or_email = forms.CharField(widget=forms.TextInput(attrs={'placeholder':'Email or username'}))
     password = forms.CharField(widget=forms.PasswordInput(attrs={'placeholder':'Password'}))
 
+    def __init__(self, *args, **kwargs):
+        self.request = kwargs.pop('request', None)
+        super().__init__(*args, **kwargs)
+        self.user_cache = None
+
     def clean(self):
         cleaned_data = super().clean()
         username_or_email = cleaned_data.get('username_or_email')
         password = cleaned_data.get('password')
 
         if username_or_email and password:
-            user = UserHelper.get_user(username_or_email)
-
-            if user:
-                if not user.check_password(password):
-                    raise forms.ValidationError('Login failed. Make sure your email/username and password are correct.')
-            else:
+            ip = LoginThrottle.client_ip(self.request)
+            retry_after = LoginThrottle.check(ip, username_or_email)
+            if retry_after:
+                raise forms.ValidationError(
+                    'Too many failed login attempts. Try again in %(seconds)s seconds.',
+                    code='throttled',
+                    params={'seconds': retry_after},
+                )
+
+            self.user_cache = UserHelper.authenticate_user(username_or_email, password)
+
+            if self.user_cache is None:
+                LoginThrottle.register_failure(ip, username_or_email)
                 raise forms.ValidationError('Login failed. Make sure your email/username and password are correct.')
-        return cleaned_data
\ No newline at end of file
+            LoginThrottle.reset(username_or_email)
+        return cleaned_data
+
+    def get_user(self):
+        return self.user_cache
\ No newline at end of file
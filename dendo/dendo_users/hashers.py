@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from
+    PASSWORD_PBKDF2_ITERATIONS. Existing hashes with a different count are
+    upgraded on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or hashers.PBKDF2PasswordHasher.iterations
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id tuned by PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_COST
+    (KiB) and PASSWORD_ARGON2_PARALLELISM. Needs the argon2-cffi package.
+    """
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', None) or hashers.Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', None) or hashers.Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', None) or hashers.Argon2PasswordHasher.parallelism
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    scrypt tuned by PASSWORD_SCRYPT_WORK_FACTOR (N, a power of two),
+    PASSWORD_SCRYPT_BLOCK_SIZE (r) and PASSWORD_SCRYPT_PARALLELISM (p).
+    """
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', None) or hashers.ScryptPasswordHasher.work_factor
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', None) or hashers.ScryptPasswordHasher.block_size
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', None) or hashers.ScryptPasswordHasher.parallelism
+
+    @property
+    def maxmem(self):
+        # OpenSSL refuses to allocate more than 32 MiB unless told otherwise.
+        return 256 * self.work_factor * self.block_size
+
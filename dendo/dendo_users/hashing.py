@@ -0,0 +1,118 @@
+"""
+Password hashing service.
+
+Every password hash in dendo_users goes through check_password() and
+make_password() here (CustomUser.check_password/set_password delegate to
+them). Depending on PASSWORD_HASH_EXECUTOR the work runs inline, on a
+thread pool, or on a process pool of PASSWORD_HASH_WORKERS processes so
+hashing can use every core regardless of the GIL. Verification also
+reports when a stored hash was made with an outdated hasher or cost, so
+callers can re-hash transparently.
+
+The async views additionally push blocking auth work (form validation,
+which includes hashing) off the event loop with run_in_pool().
+"""
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.db import close_old_connections
+
+from dendo.perf import timed
+
+_executor = None
+_hash_executor = None
+
+
+def get_executor():
+    """
+    Bounded pool used by the async views for password hashing and form
+    validation, so CPU-bound hashing never runs on the event loop.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AUTH_WORKER_THREADS', 4),
+            thread_name_prefix='dendo-auth',
+        )
+    return _executor
+
+
+def get_hash_executor():
+    global _hash_executor
+    kind = getattr(settings, 'PASSWORD_HASH_EXECUTOR', 'inline')
+    if kind == 'inline':
+        return None
+
+    if _hash_executor is None:
+        workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None)
+        if kind == 'process':
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        elif kind == 'thread':
+            _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dendo-hash')
+        else:
+            raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR '{kind}', expected inline, thread or process.")
+    return _hash_executor
+
+
+def shutdown():
+    global _executor, _hash_executor
+    for executor in (_executor, _hash_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _executor = _hash_executor = None
+
+
+def run_hash(func, *args):
+    executor = get_hash_executor()
+    with timed('hash_time'):
+        if executor is None:
+            return func(*args)
+        return executor.submit(func, *args).result()
+
+
+def check_password(password, encoded, setter=None):
+    """
+    Same contract as django.contrib.auth.hashers.check_password: calls
+    ``setter(password)`` when the password is correct but the stored hash
+    should be upgraded to the current hasher or cost.
+    """
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+
+    is_correct, must_update = run_hash(hashers.verify_password, password, encoded)
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+def make_password(password, salt=None, hasher='default'):
+    if password is None:
+        return hashers.make_password(None)
+    return run_hash(hashers.make_password, password, salt, hasher)
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call, func, args, kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+async def amake_password(password):
+    return await run_in_pool(make_password, password)
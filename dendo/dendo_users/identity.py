@@ -0,0 +1,202 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.functions import Lower
+
+from dendo.perf import count_cache
+from dendo.routers import reads_from_replica
+
+from .models import CustomUser
+
+_request_memo = ContextVar('dendo_identity_memo', default=None)
+
+
+class IdentityResolver:
+    """
+    Resolves a username or email to a CustomUser with a single lookup.
+
+    Identifiers are matched case-insensitively. Values containing '@' are
+    looked up on lower(email), anything else on lower(username), so each
+    lookup is a single probe of one of the functional unique indexes
+    declared on CustomUser.
+
+    Results are memoized for the duration of a request (see
+    ``IdentityMemoMiddleware``) and, when ``IDENTITY_CACHE`` names a cache
+    alias, shared between requests. Entries are dropped by the CustomUser
+    post_save/post_delete signals. Users read from a replica are never
+    remembered: a lagging copy could bring back a replaced password hash.
+    """
+
+    KEY_PREFIX = 'dendo_users:identity'
+
+    @staticmethod
+    def normalize(value):
+        if value is None:
+            return ''
+        return str(value).strip().lower()
+
+    @staticmethod
+    @contextmanager
+    def memo():
+        if _request_memo.get() is not None:
+            yield
+            return
+
+        token = _request_memo.set({})
+        try:
+            yield
+        finally:
+            _request_memo.reset(token)
+
+    @classmethod
+    def resolve(cls, value):
+        identifier = cls.normalize(value)
+        if not identifier:
+            return None
+
+        memo = _request_memo.get()
+        if memo is not None and identifier in memo:
+            return memo[identifier]
+
+        from_replica = reads_from_replica()
+        user = cls._cache_get(identifier)
+        if user is None:
+            user = cls._lookup(identifier)
+            if user is not None and not from_replica:
+                cls._cache_set(identifier, user)
+
+        if memo is not None and not from_replica:
+            memo[identifier] = user
+            if user is not None:
+                cls._remember(memo, user)
+
+        return user
+
+    @classmethod
+    async def aresolve(cls, value):
+        identifier = cls.normalize(value)
+        if not identifier:
+            return None
+
+        memo = _request_memo.get()
+        if memo is not None and identifier in memo:
+            return memo[identifier]
+
+        from_replica = reads_from_replica()
+        user = await cls._acache_get(identifier)
+        if user is None:
+            user = await cls._alookup(identifier)
+            if user is not None and not from_replica:
+                await cls._acache_set(identifier, user)
+
+        if memo is not None and not from_replica:
+            memo[identifier] = user
+            if user is not None:
+                cls._remember(memo, user)
+
+        return user
+
+    @classmethod
+    def invalidate(cls, user, deleted=False):
+        aliases = {cls.normalize(user.username), cls.normalize(user.email)}
+        memo = _request_memo.get()
+        if memo is not None:
+            for identifier, cached in list(memo.items()):
+                if identifier in aliases or (cached is not None and cached.pk == user.pk):
+                    del memo[identifier]
+            if not deleted:
+                cls._remember(memo, user)
+
+        cache = cls._shared_cache()
+        if cache is not None:
+            pk_key = cls._pk_key(user.pk)
+            keys = set(cache.get(pk_key) or [])
+            keys.update(cls._key(identifier) for identifier in aliases if identifier)
+            keys.add(pk_key)
+            cache.delete_many(list(keys))
+
+    @staticmethod
+    def is_email(identifier):
+        # Usernames cannot contain '@', so this also covers addresses a
+        # stricter pattern would miss, like plus-addressed ones.
+        return '@' in identifier
+
+    @classmethod
+    def lookup_queryset(cls, identifier):
+        if cls.is_email(identifier):
+            return CustomUser.objects.for_auth().alias(email_lower=Lower('email')).filter(email_lower=identifier)
+        return CustomUser.objects.for_auth().alias(username_lower=Lower('username')).filter(username_lower=identifier)
+
+    @classmethod
+    def _lookup(cls, identifier):
+        return cls.lookup_queryset(identifier).first()
+
+    @classmethod
+    async def _alookup(cls, identifier):
+        return await cls.lookup_queryset(identifier).afirst()
+
+    @classmethod
+    def _remember(cls, memo, user):
+        for identifier in (user.username, user.email):
+            identifier = cls.normalize(identifier)
+            if identifier:
+                memo[identifier] = user
+
+    @staticmethod
+    def _shared_cache():
+        alias = getattr(settings, 'IDENTITY_CACHE', None)
+        if not alias:
+            return None
+        return caches[alias]
+
+    @classmethod
+    def _key(cls, identifier):
+        digest = hashlib.sha1(identifier.encode('utf-8')).hexdigest()
+        return f'{cls.KEY_PREFIX}:{digest}'
+
+    @classmethod
+    def _pk_key(cls, pk):
+        return f'{cls.KEY_PREFIX}:pk:{pk}'
+
+    @classmethod
+    def _cache_get(cls, identifier):
+        cache = cls._shared_cache()
+        if cache is None:
+            return None
+        return count_cache(cache.get(cls._key(identifier)))
+
+    @classmethod
+    async def _acache_get(cls, identifier):
+        cache = cls._shared_cache()
+        if cache is None:
+            return None
+        return count_cache(await cache.aget(cls._key(identifier)))
+
+    @classmethod
+    def _cache_set(cls, identifier, user):
+        cache = cls._shared_cache()
+        if cache is None:
+            return
+
+        timeout = getattr(settings, 'IDENTITY_CACHE_TIMEOUT', 300)
+        key = cls._key(identifier)
+        pk_key = cls._pk_key(user.pk)
+        keys = set(cache.get(pk_key) or [])
+        keys.add(key)
+        cache.set_many({key: user, pk_key: list(keys)}, timeout)
+
+    @classmethod
+    async def _acache_set(cls, identifier, user):
+        cache = cls._shared_cache()
+        if cache is None:
+            return
+
+        timeout = getattr(settings, 'IDENTITY_CACHE_TIMEOUT', 300)
+        key = cls._key(identifier)
+        pk_key = cls._pk_key(user.pk)
+        keys = set(await cache.aget(pk_key) or [])
+        keys.add(key)
+        await cache.aset_many({key: user, pk_key: list(keys)}, timeout)
@@ -0,0 +1,120 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+AVATAR_SIZES = {'sm': 48, 'md': 96, 'lg': 256}
+BANNER_WIDTHS = {'display': 1500}
+MASTER_MAX_SIZE = 2048
+
+WEBP = features.check('webp')
+IMAGE_FORMAT = 'WEBP' if WEBP else 'JPEG'
+IMAGE_EXTENSION = '.webp' if WEBP else '.jpg'
+IMAGE_QUALITY = 82
+
+
+class ImagePipeline:
+    """
+    Turns an uploaded avatar or banner into a sanitized master image plus
+    fixed-size renditions.
+
+    The upload is decoded once, orientation from EXIF is applied and all
+    metadata is dropped before anything is encoded. Renditions are stored
+    next to the master and recorded on the user as
+    ``<field>_renditions = {label: {'name', 'url', 'width', 'height'}}``.
+    """
+
+    @staticmethod
+    def decode(upload):
+        upload.seek(0)
+        with Image.open(upload) as source:
+            image = ImageOps.exif_transpose(source)
+            has_alpha = WEBP and ('A' in image.getbands() or 'transparency' in image.info)
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.info = {}
+        return image
+
+    @staticmethod
+    def encode(image, quality=IMAGE_QUALITY):
+        buffer = io.BytesIO()
+        image.save(buffer, IMAGE_FORMAT, quality=quality, optimize=True)
+        return ContentFile(buffer.getvalue())
+
+    @staticmethod
+    def render(image, field):
+        renditions = {}
+
+        if field == 'avatar':
+            for label, size in AVATAR_SIZES.items():
+                renditions[label] = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        else:
+            for label, width in BANNER_WIDTHS.items():
+                rendition = image.copy()
+                if rendition.width > width:
+                    height = round(rendition.height * width / rendition.width)
+                    rendition = rendition.resize((width, height), Image.Resampling.LANCZOS)
+                renditions[label] = rendition
+
+        return renditions
+
+    @staticmethod
+    def rendition_name(field_file, label):
+        stem, _ = os.path.splitext(os.path.basename(field_file.name))
+        return field_file.field.generate_filename(field_file.instance, f'{stem}_{label}{IMAGE_EXTENSION}')
+
+    @classmethod
+    def apply(cls, user, field, upload):
+        image = cls.decode(upload)
+
+        master = image.copy()
+        master.thumbnail((MASTER_MAX_SIZE, MASTER_MAX_SIZE), Image.Resampling.LANCZOS)
+        stem, _ = os.path.splitext(os.path.basename(upload.name))
+        field_file = getattr(user, field)
+        field_file.save(f'{stem}{IMAGE_EXTENSION}', cls.encode(master), save=False)
+
+        storage = field_file.storage
+        renditions = {}
+        for label, rendition in cls.render(image, field).items():
+            name = storage.save(cls.rendition_name(field_file, label), cls.encode(rendition))
+            renditions[label] = {
+                'name': name,
+                'url': storage.url(name),
+                'width': rendition.width,
+                'height': rendition.height,
+            }
+
+        setattr(user, f'{field}_renditions', renditions)
+        return renditions
+
+    @staticmethod
+    def detach(user, field):
+        """
+        Clears the image and its renditions from the user and returns the
+        stored file names so the caller can delete them.
+        """
+        field_file = getattr(user, field)
+        renditions = getattr(user, f'{field}_renditions') or {}
+
+        names = [rendition['name'] for rendition in renditions.values()]
+        if field_file:
+            names.append(field_file.name)
+
+        setattr(user, field, None)
+        setattr(user, f'{field}_renditions', {})
+        return names
+
+    @staticmethod
+    def replaced(user, field):
+        """
+        For an image field that was assigned a new upload, clears the old
+        renditions and returns the stored names of the image and renditions
+        it replaces, as last read from the database.
+        """
+        renditions = user.loaded_value(f'{field}_renditions') or {}
+        names = [rendition['name'] for rendition in renditions.values()]
+        if user.loaded_value(field):
+            names.append(user.loaded_value(field))
+
+        setattr(user, f'{field}_renditions', {})
+        return names
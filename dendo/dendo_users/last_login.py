@@ -0,0 +1,126 @@
+"""
+Coalesced last_login writes.
+
+Django saves last_login on every login: an UPDATE of the CustomUsers row
+plus the post_save cache invalidations. LAST_LOGIN_UPDATE selects:
+
+- 'always': Django's behaviour.
+- 'throttled': written at login, at most once per LAST_LOGIN_INTERVAL
+  seconds per user.
+- 'buffered': the same limit, written every LAST_LOGIN_FLUSH_INTERVAL
+  seconds by a background thread with one bulk UPDATE per batch.
+
+Throttled writes are plain queryset updates, so they fire no signals.
+When LAST_LOGIN_CACHE is set the limit holds across processes.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.utils import timezone
+
+from dendo_activity.buffer import BackgroundFlusher
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+class LastLoginBuffer(BackgroundFlusher):
+    thread_name = 'last-login-flusher'
+
+    def __init__(self, flush_interval=10.0, batch_size=500):
+        super().__init__(flush_interval)
+        self.batch_size = batch_size
+        self.pending = {}
+
+    def add(self, user_id, when):
+        with self.lock:
+            self.pending[user_id] = max(when, self.pending.get(user_id, when))
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending
+
+    def clear(self):
+        self.pending = {}
+
+    def flush(self):
+        pending = self.take()
+        if not pending:
+            return 0
+
+        users = [CustomUser(pk=user_id, last_login=when) for user_id, when in pending.items()]
+        try:
+            CustomUser.objects.bulk_update(users, ['last_login'], batch_size=self.batch_size)
+        except DatabaseError:
+            logger.exception('Could not write last_login of %s users, keeping them for the next flush.', len(users))
+            for user_id, when in pending.items():
+                self.add(user_id, when)
+            return 0
+        return len(users)
+
+
+def get_buffer():
+    global _buffer
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LastLoginBuffer(flush_interval=getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 10.0))
+    return _buffer
+
+
+class LastLogin:
+    KEY_PREFIX = 'dendo_users:last_login'
+
+    @staticmethod
+    def mode():
+        return getattr(settings, 'LAST_LOGIN_UPDATE', 'always')
+
+    @staticmethod
+    def install():
+        """Replaces Django's user_logged_in receiver with ``record``."""
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(LastLogin.record, dispatch_uid='dendo_last_login')
+
+    @classmethod
+    def record(cls, sender, user, **kwargs):
+        if cls.mode() == 'always':
+            update_last_login(sender, user, **kwargs)
+            return
+
+        now = timezone.now()
+        previous = user.last_login
+        user.last_login = now
+
+        interval = timedelta(seconds=getattr(settings, 'LAST_LOGIN_INTERVAL', 600))
+        if previous is not None and now - previous < interval:
+            return
+        if not cls._claim(user.pk, interval):
+            return
+
+        if cls.mode() == 'buffered':
+            buffer = get_buffer()
+            buffer.start()
+            buffer.add(user.pk, now)
+        else:
+            CustomUser.objects.filter(pk=user.pk).update(last_login=now)
+
+    @classmethod
+    def _claim(cls, user_id, interval):
+        # Loaded instances may be cached with an old last_login; the cache
+        # key makes sure only one login per interval gets to write.
+        alias = getattr(settings, 'LAST_LOGIN_CACHE', None)
+        if not alias:
+            return True
+        return caches[alias].add(f'{cls.KEY_PREFIX}:{user_id}', 1, int(interval.total_seconds()))
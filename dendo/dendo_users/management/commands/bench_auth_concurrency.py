@@ -0,0 +1,89 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from dendo_users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares requests per second of the sync and async login views while '
+        'profile pages are served concurrently.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight.')
+        parser.add_argument('--login-ratio', type=float, default=0.25, help='Share of requests that are logins.')
+
+    def handle(self, *args, **options):
+        username = f'bench_{uuid.uuid4().hex[:12]}'
+        password = uuid.uuid4().hex
+        user = CustomUser.objects.create_user(username=username, email=f'{username}@example.com', password=password)
+
+        setup_test_environment()
+        try:
+            plan = self.build_plan(options['requests'], options['login_ratio'], username, password)
+
+            for label, runner in (('sync', self.run_sync), ('async', self.run_async)):
+                elapsed = runner(plan, options['concurrency'])
+                self.stdout.write(
+                    f'{label:>5}: {len(plan)} requests in {elapsed:.2f}s '
+                    f'({len(plan) / elapsed:.1f} req/s, concurrency {options["concurrency"]})'
+                )
+        finally:
+            teardown_test_environment()
+            user.delete()
+
+    def build_plan(self, total, login_ratio, username, password):
+        every = max(1, round(1 / login_ratio)) if login_ratio > 0 else total + 1
+        profile_url = reverse('dendo_users:user_page', kwargs={'username': username})
+        credentials = {'username_or_email': username, 'password': password}
+        plan = []
+        for index in range(total):
+            if index % every == 0:
+                plan.append(('login', credentials))
+            else:
+                plan.append((profile_url, None))
+        return plan
+
+    def run_sync(self, plan, concurrency):
+        login_url = reverse('dendo_users:login_page')
+
+        def send(item):
+            url, data = item
+            client = Client()
+            if url == 'login':
+                return client.post(login_url, data).status_code
+            return client.get(url).status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, plan))
+        return time.perf_counter() - started
+
+    def run_async(self, plan, concurrency):
+        login_url = reverse('dendo_users:async_login_page')
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def send(item):
+                url, data = item
+                async with semaphore:
+                    client = AsyncClient()
+                    if url == 'login':
+                        return (await client.post(login_url, data)).status_code
+                    return (await client.get(url)).status_code
+
+            started = time.perf_counter()
+            await asyncio.gather(*(send(item) for item in plan))
+            return time.perf_counter() - started
+
+        return asyncio.run(main())
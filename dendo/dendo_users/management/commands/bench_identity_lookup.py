@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from dendo_users.identity import IdentityResolver
+from dendo_users.models import CustomUser
+
+PREFIX = 'lookupbench'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a users table and compares the legacy OR lookup with the '
+        'indexed case-insensitive lookup used by IdentityResolver. '
+        'Run against a scratch database: seeded rows are removed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='Users to seed.')
+        parser.add_argument('--lookups', type=int, default=2000, help='Lookups per strategy.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--database', default='default', help='Database alias to run against.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users.')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        self.stdout.write(f'Database: {connections[using].vendor} ({using})')
+
+        existing = CustomUser.objects.using(using).filter(username__startswith=PREFIX).count()
+        self.seed(using, existing, options['users'], options['batch_size'])
+
+        try:
+            rng = random.Random(42)
+            samples = []
+            for _ in range(options['lookups']):
+                index = rng.randrange(options['users'])
+                samples.append(f'{PREFIX}{index}' if index % 2 else f'{PREFIX}{index}@example.com')
+
+            strategies = {
+                'or-lookup': lambda value: CustomUser.objects.using(using).filter(
+                    Q(email=value) | Q(username=value)
+                ).first(),
+                'indexed-lookup': lambda value: IdentityResolver.lookup_queryset(
+                    IdentityResolver.normalize(value)
+                ).using(using).first(),
+            }
+
+            for label, lookup in strategies.items():
+                self.report(label, lookup, samples)
+
+            for value in (samples[0], samples[1]):
+                plan = IdentityResolver.lookup_queryset(IdentityResolver.normalize(value)).using(using).explain()
+                self.stdout.write(f'Plan for {value!r}:\n{plan}')
+        finally:
+            if not options['keep']:
+                with connections[using].cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {connections[using].ops.quote_name(CustomUser._meta.db_table)} WHERE username LIKE %s',
+                        [f'{PREFIX}%'],
+                    )
+
+    def seed(self, using, existing, total, batch_size):
+        if existing >= total:
+            return
+
+        password = make_password(None)
+        started = time.perf_counter()
+        for start in range(existing, total, batch_size):
+            CustomUser.objects.using(using).bulk_create([
+                CustomUser(
+                    username=f'{PREFIX}{index}',
+                    email=f'{PREFIX}{index}@example.com',
+                    password=password,
+                )
+                for index in range(start, min(start + batch_size, total))
+            ])
+        self.stdout.write(f'Seeded {total - existing} users in {time.perf_counter() - started:.1f}s')
+
+    def report(self, label, lookup, samples):
+        timings = []
+        for value in samples:
+            started = time.perf_counter()
+            lookup(value)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{label:>15}: p50 {percentiles[49]:.3f}ms  p95 {percentiles[94]:.3f}ms  '
+            f'p99 {percentiles[98]:.3f}ms  over {len(samples)} lookups'
+        )
@@ -0,0 +1,71 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from dendo_users.forms import LogInForm
+from dendo_users.models import CustomUser
+from dendo_users.throttling import LoginThrottle
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulates a credential-stuffing burst against LogInForm and reports '
+        'how many attempts reached the password hasher and the CPU time spent, '
+        'with and without login throttling.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=300, help='Failed login attempts in the burst.')
+        parser.add_argument('--ips', type=int, default=3, help='Distinct client addresses used by the attacker.')
+        parser.add_argument('--targets', type=int, default=5, help='Distinct usernames tried.')
+
+    def handle(self, *args, **options):
+        prefix = f'bench_{uuid.uuid4().hex[:8]}'
+        users = [
+            CustomUser.objects.create_user(
+                username=f'{prefix}_{index}', email=f'{prefix}_{index}@example.com', password=uuid.uuid4().hex
+            )
+            for index in range(options['targets'])
+        ]
+
+        try:
+            runs = (
+                ('unthrottled', {'LOGIN_THROTTLE_IP_LIMIT': 0, 'LOGIN_THROTTLE_IDENTIFIER_LIMIT': 0}),
+                ('throttled', {}),
+            )
+            for run, (label, overrides) in enumerate(runs):
+                LoginThrottle.clear_memory()
+                with override_settings(**overrides):
+                    hashed, rejected, cpu, wall = self.attack(users, options['attempts'], options['ips'], run)
+                for user in users:
+                    LoginThrottle.reset(user.username)
+
+                self.stdout.write(
+                    f'{label:>11}: {hashed} attempts hashed, {rejected} rejected, '
+                    f'{cpu:.2f}s CPU ({cpu / options["attempts"] * 1000:.2f} ms per attempt), {wall:.2f}s wall'
+                )
+        finally:
+            CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def attack(self, users, attempts, ips, run):
+        factory = RequestFactory()
+        hashed = rejected = 0
+
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        for index in range(attempts):
+            request = factory.post('/', REMOTE_ADDR=f'198.18.{run}.{index % ips + 1}')
+            form = LogInForm({
+                'username_or_email': users[index % len(users)].username,
+                'password': f'guess-{index}',
+            }, request=request)
+            form.is_valid()
+            if form.has_error('__all__', code='throttled'):
+                rejected += 1
+            else:
+                hashed += 1
+
+        return hashed, rejected, time.process_time() - cpu_started, time.perf_counter() - wall_started
+
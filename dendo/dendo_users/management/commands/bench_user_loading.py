@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dendo_users.models import CustomUser, CustomUserQuerySet
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the cost of building CustomUser instances from database rows, '
+        'for the full model and for each named column set. No database access.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Instances built per variant.')
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        row = self.sample_row()
+        all_fields = [field.attname for field in CustomUser._meta.concrete_fields]
+
+        variants = [
+            # What every load used to pay: the old __init__ read both image
+            # fields, building two FieldFile objects per row.
+            ('full, images read (old __init__)', all_fields, True),
+            ('full', all_fields, False),
+            ('for_profile_card()', self.attnames(CustomUserQuerySet.PROFILE_CARD_FIELDS), False),
+            ('for_admin_list()', self.attnames(CustomUserQuerySet.ADMIN_LIST_FIELDS), False),
+            ('for_auth()', self.attnames(CustomUserQuerySet.AUTH_FIELDS), False),
+        ]
+
+        baseline = None
+        for label, field_names, read_images in variants:
+            values = [row[name] for name in field_names]
+            elapsed = self.build(count, field_names, values, read_images)
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f'{label:>34}: {elapsed:.3f}s for {count} rows '
+                f'({elapsed / count * 1e6:.2f} us per row, {elapsed / baseline:.0%} of the old cost)'
+            )
+
+    def build(self, count, field_names, values, read_images):
+        from_db = CustomUser.from_db
+        started = time.perf_counter()
+        for _ in range(count):
+            user = from_db('default', field_names, values)
+            if read_images:
+                user.avatar
+                user.banner
+        return time.perf_counter() - started
+
+    def attnames(self, names):
+        return [CustomUser._meta.get_field(name).attname for name in names]
+
+    def sample_row(self):
+        now = timezone.now()
+        return {
+            'id': 1,
+            'password': 'pbkdf2_sha256$1000000$salt$hash',
+            'last_login': now,
+            'is_superuser': False,
+            'username': 'sample',
+            'is_staff': False,
+            'is_active': True,
+            'date_joined': now,
+            'avatar': 'user_images/ab/cd/abcd.webp',
+            'banner': 'user_images/ef/01/ef01.webp',
+            'avatar_renditions': {},
+            'banner_renditions': {},
+            'email': 'sample@example.com',
+            'bio': 'No bio yet.',
+            'is_verified': False,
+            'updated_at': now,
+        }
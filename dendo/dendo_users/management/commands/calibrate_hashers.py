@@ -0,0 +1,76 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand
+
+
+def hash_for(algorithm, seconds):
+    """
+    Hashes a fixed password with ``algorithm`` for ``seconds`` and returns
+    how many hashes were made.
+    """
+    hasher = get_hasher(algorithm)
+    salt = hasher.salt()
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        hasher.encode('calibration-password', salt)
+        count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures hashes per second of each configured password hasher on one '
+        'core and across a process pool, and suggests costs and worker counts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help='Time spent measuring each hasher.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes in the pool run.')
+        parser.add_argument('--target-ms', type=float, default=250.0, help='Desired time for a single hash.')
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        workers = options['workers']
+        self.stdout.write(f'Executor: {settings.PASSWORD_HASH_EXECUTOR}, {workers} measuring processes')
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+            for hasher in get_hashers():
+                if hasher.library:
+                    try:
+                        hasher._load_library()
+                    except ValueError as error:
+                        self.stdout.write(f'{hasher.algorithm:>14}: skipped ({error})')
+                        continue
+
+                single = hash_for(hasher.algorithm, seconds) / seconds
+                counts = pool.map(hash_for, [hasher.algorithm] * workers, [seconds] * workers)
+                aggregate = sum(counts) / seconds
+
+                latency_ms = 1000 / single
+                # Workers beyond the measured speedup only queue behind each other.
+                suggested = max(1, min(workers, round(aggregate / single)))
+                self.stdout.write(
+                    f'{hasher.algorithm:>14}: {single:.1f}/s on one core ({latency_ms:.0f} ms per hash), '
+                    f'{aggregate:.1f}/s across {workers} processes '
+                    f'({aggregate / single:.1f}x), suggested PASSWORD_HASH_WORKERS={suggested}'
+                )
+                self.suggest_cost(hasher, latency_ms, options['target_ms'])
+
+    def suggest_cost(self, hasher, latency_ms, target_ms):
+        scale = target_ms / latency_ms
+        if hasattr(hasher, 'iterations'):
+            self.stdout.write(f'{"":>14}  PASSWORD_PBKDF2_ITERATIONS={round(hasher.iterations * scale)} for ~{target_ms:.0f} ms')
+        elif hasher.algorithm == 'argon2':
+            self.stdout.write(f'{"":>14}  PASSWORD_ARGON2_TIME_COST={max(1, round(hasher.time_cost * scale))} for ~{target_ms:.0f} ms')
+        elif hasher.algorithm == 'scrypt':
+            work_factor = 2 ** max(1, round(math.log2(hasher.work_factor * scale)))
+            self.stdout.write(f'{"":>14}  PASSWORD_SCRYPT_WORK_FACTOR={work_factor} for ~{target_ms:.0f} ms')
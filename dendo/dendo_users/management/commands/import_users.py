@@ -0,0 +1,171 @@
+import csv
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from dendo_users.identity import IdentityResolver
+from dendo_users.models import CustomUser
+
+
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-creates users from a CSV or JSON Lines file with username, email, '
+        'password and optional bio columns. Rows are streamed, checked for '
+        'duplicates with one query per batch and inserted with bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--hashed', action='store_true', help='Passwords are already encoded Django hashes.')
+        parser.add_argument('--workers', type=int, default=None, help='Processes used for hashing, 0 hashes inline.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.json')) else 'csv')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+
+        self.username_validator = CustomUser.username_validator
+        self.created = 0
+        self.skipped = 0
+        self.read = 0
+        pool = None
+        if not options['hashed'] and options['workers'] != 0:
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup)
+
+        try:
+            for batch in batched(read_rows(stream, file_format), options['batch_size']):
+                self.import_batch(batch, options['hashed'], pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(f'Created {self.created} users, skipped {self.skipped}.')
+
+    def import_batch(self, batch, hashed, pool):
+        rows = []
+        usernames = set()
+        emails = set()
+
+        first_line = self.read + 1
+        self.read += len(batch)
+
+        for line, row in enumerate(batch, start=first_line):
+            username = (row.get('username') or '').strip()
+            email = (row.get('email') or '').strip().lower()
+            try:
+                self.validate(username, email)
+            except ValidationError as error:
+                self.skip(line, error.messages[0])
+                continue
+
+            if username.lower() in usernames or email in emails:
+                self.skip(line, 'duplicate username or email in input')
+                continue
+
+            usernames.add(username.lower())
+            emails.add(email)
+            rows.append((line, username, email, row))
+
+        if not rows:
+            return
+
+        taken_usernames = set()
+        taken_emails = set()
+        existing = CustomUser.objects.alias(
+            username_lower=Lower('username'),
+            email_lower=Lower('email'),
+        ).filter(
+            Q(username_lower__in=usernames) | Q(email_lower__in=emails)
+        ).values_list('username', 'email')
+        for username, email in existing:
+            taken_usernames.add(username.lower())
+            taken_emails.add(email.lower())
+
+        accepted = []
+        for line, username, email, row in rows:
+            if username.lower() in taken_usernames or email in taken_emails:
+                self.skip(line, 'username or email already registered')
+            else:
+                accepted.append((line, username, email, row))
+
+        passwords = [row.get('password') or None for _, _, _, row in accepted]
+        if hashed:
+            encoded = [self.check_hash(password) for password in passwords]
+        elif pool is not None:
+            encoded = list(pool.map(make_password, passwords, chunksize=16))
+        else:
+            encoded = [make_password(password) for password in passwords]
+
+        lines = [line for line, _, _, _ in accepted]
+        users = [
+            CustomUser(
+                username=username,
+                email=email,
+                password=password,
+                bio=row.get('bio') or CustomUser._meta.get_field('bio').default,
+            )
+            for (_, username, email, row), password in zip(accepted, encoded)
+        ]
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users)
+            self.created += len(users)
+        except IntegrityError:
+            # Someone registered one of these names since the batch was
+            # checked; fall back to row by row inserts for this batch.
+            for line, user in zip(lines, users):
+                try:
+                    with transaction.atomic():
+                        user.save(force_insert=True)
+                    self.created += 1
+                except IntegrityError:
+                    self.skip(line, 'username or email already registered')
+
+    def validate(self, username, email):
+        if not username or not email:
+            raise ValidationError('username and email are required')
+        if IdentityResolver.is_email(username):
+            raise ValidationError("username cannot contain '@'")
+        self.username_validator(username)
+        validate_email(email)
+
+    def check_hash(self, password):
+        if password is None:
+            return make_password(None)
+        try:
+            identify_hasher(password)
+        except ValueError:
+            raise CommandError('--hashed was given but a password is not an encoded hash.')
+        return password
+
+    def skip(self, row, reason):
+        self.skipped += 1
+        self.stderr.write(f'Row {row}: skipped, {reason}.')
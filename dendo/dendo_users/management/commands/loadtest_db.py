@@ -0,0 +1,81 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from dendo_users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends concurrent profile reads and profile edits through the full '
+        'request stack and reports latency percentiles, so database profiles '
+        '(see dendo/database.py) can be compared by re-running with different '
+        'environment settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--write-ratio', type=float, default=0.1, help='Share of requests that write.')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        self.stdout.write(
+            f"Profile: {connection.vendor}  CONN_MAX_AGE={database.get('CONN_MAX_AGE')}  "
+            f"OPTIONS={database.get('OPTIONS')}"
+        )
+
+        users = self.create_users(options['concurrency'])
+        write_every = max(1, round(1 / options['write_ratio'])) if options['write_ratio'] > 0 else None
+
+        setup_test_environment()
+        try:
+            def send(index):
+                user = users[index % len(users)]
+                client = Client()
+                started = time.perf_counter()
+                try:
+                    if write_every and index % write_every == 0:
+                        client.force_login(user)
+                        client.post(
+                            reverse('dendo_users:user_edit_page', kwargs={'username': user.username}),
+                            {'bio': f'Load test bio {index}'},
+                        )
+                    else:
+                        client.get(reverse('dendo_users:user_page', kwargs={'username': user.username}))
+                    return (time.perf_counter() - started) * 1000
+                finally:
+                    close_old_connections()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                timings = list(pool.map(send, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+        finally:
+            teardown_test_environment()
+            CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{len(timings)} requests in {elapsed:.2f}s ({len(timings) / elapsed:.1f} req/s)  '
+            f'p50 {percentiles[49]:.1f}ms  p95 {percentiles[94]:.1f}ms  p99 {percentiles[98]:.1f}ms'
+        )
+
+    def create_users(self, count):
+        users = []
+        for _ in range(count):
+            username = f'load_{uuid.uuid4().hex[:12]}'
+            users.append(CustomUser.objects.create_user(
+                username=username,
+                email=f'{username}@example.com',
+                password=None,
+            ))
+        return users
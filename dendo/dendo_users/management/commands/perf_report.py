@@ -0,0 +1,81 @@
+import glob
+import json
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregates the request timing log written by dendo.perf into '
+        'p50/p95/p99 latency, queries, cache hits and hash time per URL name.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Log files to read. Defaults to PERF_LOG_FILE and its rotations.')
+        parser.add_argument('--since', type=float, default=0, help='Only requests logged after this UNIX timestamp.')
+        parser.add_argument('--sort', choices=['p50', 'p95', 'p99', 'count'], default='p95')
+
+    def handle(self, *args, **options):
+        files = options['files'] or sorted(glob.glob(f'{settings.PERF_LOG_FILE}*'))
+        rows = defaultdict(list)
+
+        for path in files:
+            with open(path, encoding='utf-8') as log_file:
+                for line in log_file:
+                    entry = self.parse(line)
+                    if entry is None or entry.get('time', 0) < options['since']:
+                        continue
+                    rows[entry.get('url_name') or entry['path']].append(entry)
+
+        if not rows:
+            self.stdout.write('No requests logged.')
+            return
+
+        report = [self.summarize(name, entries) for name, entries in rows.items()]
+        report.sort(key=lambda row: row[options['sort']], reverse=True)
+
+        header = f'{"url name":<40} {"count":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"db ms":>8} {"cache hit":>9} {"hash ms":>8} {"tpl ms":>8}'
+        self.stdout.write(header)
+        for row in report:
+            self.stdout.write(
+                f'{row["name"][:40]:<40} {row["count"]:>7} {row["p50"]:>9.1f} {row["p95"]:>9.1f} {row["p99"]:>9.1f} '
+                f'{row["queries"]:>8.1f} {row["db_ms"]:>8.1f} {row["cache_hit"]:>8.0%} {row["hash_ms"]:>8.1f} {row["template_ms"]:>8.1f}'
+            )
+
+    def parse(self, line):
+        try:
+            entry = json.loads(line[line.index('{'):])
+        except ValueError:
+            return None
+        if entry.get('event') != 'request':
+            return None
+        return entry
+
+    def summarize(self, name, entries):
+        count = len(entries)
+        durations = sorted(entry['duration_ms'] for entry in entries)
+        hits = sum(entry['cache_hits'] for entry in entries)
+        lookups = hits + sum(entry['cache_misses'] for entry in entries)
+
+        return {
+            'name': name,
+            'count': count,
+            'p50': percentile(durations, 0.50),
+            'p95': percentile(durations, 0.95),
+            'p99': percentile(durations, 0.99),
+            'queries': sum(entry['db_queries'] for entry in entries) / count,
+            'db_ms': sum(entry['db_ms'] for entry in entries) / count,
+            'cache_hit': hits / lookups if lookups else 0,
+            'hash_ms': sum(entry['hash_ms'] for entry in entries) / count,
+            'template_ms': sum(entry['template_ms'] for entry in entries) / count,
+        }
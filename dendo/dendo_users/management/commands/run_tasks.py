@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from dendo_users.tasks import TaskWorker
+
+
+class Command(BaseCommand):
+    help = 'Runs deferred tasks queued with dendo_users.tasks.enqueue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Size of the worker thread pool.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Tasks claimed per poll.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit.')
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        worker = TaskWorker(workers=options['workers'], batch_size=options['batch_size'])
+        self.stdout.write(f'Task worker started with {worker.workers} threads.')
+
+        try:
+            while True:
+                processed = worker.run_pending()
+                if processed:
+                    self.stdout.write(f'Processed {processed} task(s).')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Task worker stopped.')
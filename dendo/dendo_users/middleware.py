@@ -0,0 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .identity import IdentityResolver
+
+
+class IdentityMemoMiddleware:
+    """
+    Opens a per-request memo so repeated username/email lookups made by
+    forms, helpers and permission checks hit the database at most once.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with IdentityResolver.memo():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with IdentityResolver.memo():
+            return await self.get_response(request)
@@ -1,31 +1,252 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import hashing
+from .storage import user_image_storage
 
 # Create your models here.
 
-class CustomUser(AbstractUser):
+class UsernameValidator(UnicodeUsernameValidator):
+    """
+    Django's username rule without '@': identifiers containing one are
+    looked up as emails (see IdentityResolver.is_email).
+    """
+
+    regex = r'^[\w.+-]+\Z'
+    message = 'Enter a valid username. This value may contain only letters, numbers, and ./+/-/_ characters.'
+
+
+class CustomUserQuerySet(models.QuerySet):
+    """
+    Named column sets for the hot paths, so they skip the image, rendition
+    and bio columns they never read.
+    """
+
+    AUTH_FIELDS = ['id', 'username', 'email', 'password', 'is_active', 'is_staff', 'is_superuser', 'last_login']
+    PROFILE_CARD_FIELDS = [
+        'id', 'username', 'bio', 'is_verified', 'date_joined', 'updated_at',
+        'avatar', 'avatar_renditions', 'banner', 'banner_renditions',
+    ]
+    # __str__, used for the changelist row labels, reads date_joined and updated_at.
+    ADMIN_LIST_FIELDS = ['id', 'username', 'email', 'is_active', 'is_staff', 'date_joined', 'updated_at']
+
+    def for_auth(self):
+        return self.only(*self.AUTH_FIELDS)
+
+    def for_profile_card(self):
+        return self.only(*self.PROFILE_CARD_FIELDS)
+
+    def for_admin_list(self):
+        return self.only(*self.ADMIN_LIST_FIELDS)
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._current_avatar = self.avatar
-        self._current_banner = self.banner
+class CustomUser(AbstractUser):
 
     first_name=None
     last_name=None
 
-    avatar = models.ImageField( upload_to= 'user_images/', null=True, blank=True)
-    banner = models.ImageField( upload_to= 'user_images/', null=True, blank=True)
+    username_validator = UsernameValidator()
+    username = models.CharField(
+        'username',
+        max_length=150,
+        unique=True,
+        help_text='Required. 150 characters or fewer. Letters, digits and ./+/-/_ only.',
+        validators=[username_validator],
+        error_messages={'unique': 'A user with that username already exists.'},
+    )
+
+    avatar = models.ImageField( upload_to= 'user_images/', storage=user_image_storage, null=True, blank=True)
+    banner = models.ImageField( upload_to= 'user_images/', storage=user_image_storage, null=True, blank=True)
+    avatar_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    banner_renditions = models.JSONField(default=dict, blank=True, editable=False)
     email = models.EmailField(max_length=254, unique=True)
     bio = models.CharField(max_length=160, default='No bio yet.')
     is_verified = models.BooleanField(default=False)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = CustomUserManager()
 
-    objects = UserManager()
+    # What profile pages show. updated_at, and with it the Last-Modified of
+    # cached profile pages, only moves when one of these changes.
+    PUBLIC_FIELDS = {'username', 'bio', 'is_verified', 'avatar', 'banner', 'avatar_renditions', 'banner_renditions'}
 
     class Meta:
         db_table = 'CustomUsers'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        constraints = [
+            models.UniqueConstraint(Lower('username'), name='customuser_username_lower_uniq'),
+            models.UniqueConstraint(Lower('email'), name='customuser_email_lower_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date_joined'], name='customuser_date_joined_idx'),
+            models.Index(fields=['username'], condition=models.Q(is_staff=True), name='customuser_staff_idx'),
+            models.Index(fields=['username'], condition=models.Q(is_active=False), name='customuser_inactive_idx'),
+        ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Raw column values as loaded, for cheap change detection; deferred
+        # columns are simply absent.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """
+        Attribute names of loaded fields whose value differs from the one
+        in the database, plus deferred fields that were assigned since, or
+        None for an instance that was never loaded or fully saved. Deferred
+        fields are never fetched for this, and JSON values are only seen as
+        changed when reassigned.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+
+        changed = {attname for attname, original in loaded.items() if self._current_value(attname, original) != original}
+        changed.update(
+            field.attname for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and field.attname not in loaded
+        )
+        return changed
+
+    def loaded_value(self, attname):
+        """The value of ``attname`` as last read from or written to the database."""
+        return getattr(self, '_loaded_values', {}).get(attname)
+
+    def _current_value(self, attname, default=None):
+        value = self.__dict__.get(attname, default)
+        if isinstance(value, FieldFile):
+            return value.name
+        return value
+
+    def _mark_stored(self, attnames=None):
+        if attnames is None:
+            self._loaded_values = {}
+            attnames = [field.attname for field in self._meta.concrete_fields if field.attname in self.__dict__]
+        elif getattr(self, '_loaded_values', None) is None:
+            return
+        self._loaded_values.update((attname, self._current_value(attname)) for attname in attnames)
+
+    def save(self, *args, **kwargs):
+        """
+        Without ``update_fields``, a tracked instance only writes the columns
+        that changed and skips the query (and the post_save signals) when
+        nothing did.
+        """
+        changed = self.changed_fields()
+        update_fields = kwargs.get('update_fields')
+
+        if changed is not None and not self._state.adding and not kwargs.get('force_insert'):
+            if update_fields is None:
+                if not changed:
+                    return
+                update_fields = changed
+            else:
+                changed &= set(update_fields)
+        elif update_fields is not None:
+            changed = set(update_fields)
+
+        if changed is None or changed & self.PUBLIC_FIELDS:
+            self.updated_at = timezone.now()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'updated_at'}
+
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        self._mark_stored(update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._mark_stored(fields)
+
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Verifies through the hashing service and upgrades the stored hash
+        when the hasher or its cost settings changed.
+        """
+        def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return hashing.check_password(raw_password, self.password, setter)
+
+    async def acheck_password(self, raw_password):
+        return await hashing.run_in_pool(self.check_password, raw_password)
+
+    def get_rendition_url(self, field, label):
+        rendition = getattr(self, f'{field}_renditions').get(label)
+        if rendition:
+            return rendition['url']
+
+        image = getattr(self, field)
+        return image.url if image else None
+
     def __str__(self):
         return f'Email: {self.email} Username: {self.username} Created at: {self.date_joined} Updated at: {self.updated_at}'
+
+
+class QueuedTask(models.Model):
+    """
+    A unit of deferred work picked up by ``manage.py run_tasks``.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    # Set on each claim; only the holder of the current token may finish the task.
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'QueuedTasks'
+        indexes = [models.Index(fields=['status', 'run_after'], name='queuedtask_status_run_after')]
+
+    def __str__(self):
+        return f'Task: {self.name} Status: {self.status} Attempts: {self.attempts}'
+
+
+class StoredBlob(models.Model):
+    """
+    Reference count for a file kept by ContentAddressedStorage.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'StoredBlobs'
+
+    def __str__(self):
+        return f'Blob: {self.name} References: {self.references}'
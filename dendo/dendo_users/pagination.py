@@ -0,0 +1,49 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_rows(model, using='default'):
+    """
+    Cheap row count estimate for a whole table, or None when the backend
+    has no such statistic.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [connection.ops.quote_name(table)])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a large table exactly.
+
+    Unfiltered querysets use the planner's row estimate once it is above
+    ``exact_below``; filtered querysets are counted up to ``count_cap``
+    rows, so the count stays bounded however broad the filter is.
+    """
+
+    exact_below = 100_000
+    count_cap = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return queryset.order_by()[:self.count_cap].count()
+
+        estimate = estimate_rows(queryset.model, queryset.db)
+        if estimate is not None and estimate >= self.exact_below:
+            return estimate
+        return queryset.count()
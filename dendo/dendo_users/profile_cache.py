@@ -0,0 +1,76 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import quote_etag
+
+from dendo.perf import count_cache
+
+from .models import CustomUser
+
+
+class ProfileCache:
+    """
+    Rendered profile pages for anonymous visitors, keyed by username and
+    updated_at.
+
+    Each entry holds the page body together with its ETag (a hash of the
+    body) and Last-Modified time, so a revalidation costs one indexed read
+    of updated_at and no template rendering. As updated_at is part of the
+    key, writes that bypass save() and its signals (queryset updates,
+    bulk_update) still get a fresh page as long as they move updated_at.
+    Entries are also dropped by the CustomUser post_save/post_delete
+    signals.
+    """
+
+    KEY_PREFIX = 'dendo_users:profile'
+
+    @staticmethod
+    def _cache():
+        return caches[getattr(settings, 'PROFILE_CACHE', 'default')]
+
+    @classmethod
+    def _key(cls, username, updated_at):
+        version = updated_at.timestamp() if updated_at else ''
+        digest = hashlib.sha1(f'{username}:{version}'.encode('utf-8')).hexdigest()
+        return f'{cls.KEY_PREFIX}:{digest}'
+
+    @classmethod
+    def _pk_key(cls, pk):
+        return f'{cls.KEY_PREFIX}:pk:{pk}'
+
+    @classmethod
+    def get(cls, username):
+        row = CustomUser.objects.filter(username=username).values_list('updated_at').first()
+        if row is None:
+            return None
+        return count_cache(cls._cache().get(cls._key(username, row[0])))
+
+    @classmethod
+    def set(cls, user, response, timeout=None):
+        content = response.content
+        entry = {
+            'user_id': user.pk,
+            'content': content,
+            'content_type': response.get('Content-Type'),
+            'etag': quote_etag(hashlib.md5(content, usedforsecurity=False).hexdigest()),
+            'last_modified': int(user.updated_at.timestamp()) if user.updated_at else None,
+        }
+
+        if timeout is None:
+            timeout = getattr(settings, 'PROFILE_CACHE_TIMEOUT', 600)
+        key = cls._key(user.username, user.updated_at)
+        cls._cache().set_many({key: entry, cls._pk_key(user.pk): key}, timeout)
+        return entry
+
+    @classmethod
+    def invalidate(cls, user):
+        cache = cls._cache()
+        pk_key = cls._pk_key(user.pk)
+        keys = [pk_key]
+
+        previous_key = cache.get(pk_key)
+        if previous_key:
+            keys.append(previous_key)
+
+        cache.delete_many(keys)
@@ -0,0 +1,90 @@
+import sys
+
+from django.db.models.functions import Lower
+
+from .identity import IdentityResolver
+from .models import CustomUser
+from .storage import user_image_storage
+
+
+def prefix_bounds(prefix):
+    """
+    Returns ``(low, high)`` so that ``low <= value < high`` holds for every
+    value starting with ``prefix``. Unlike LIKE 'prefix%', a range can be
+    answered from a plain btree index on every backend.
+
+    ``high`` is None (no upper bound) when the prefix is made of U+10FFFF
+    only. Surrogates are skipped, they are not valid in stored text.
+    """
+    for index in range(len(prefix) - 1, -1, -1):
+        code = ord(prefix[index]) + 1
+        if code == 0xD800:
+            code = 0xE000
+        if code <= sys.maxunicode:
+            return prefix, prefix[:index] + chr(code)
+    return prefix, None
+
+
+class UserSearch:
+    """
+    Case-insensitive prefix search on username or email, answered from the
+    lower(username)/lower(email) unique indexes declared on CustomUser.
+
+    Those indexes are kept sorted by the database on every write, so they
+    serve as the precomputed prefix index: an autocomplete request is one
+    index range probe with a LIMIT, never a table scan.
+    """
+
+    PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 50
+    CARD_FIELDS = ('username', 'bio', 'is_verified', 'avatar', 'avatar_renditions')
+
+    @staticmethod
+    def prefix(queryset, term, field=None):
+        term = IdentityResolver.normalize(term)
+        if not term:
+            return queryset.none()
+
+        field = field or ('email' if '@' in term else 'username')
+        low, high = prefix_bounds(term)
+        queryset = queryset.alias(**{f'{field}_lower': Lower(field)}).filter(**{f'{field}_lower__gte': low})
+        if high is not None:
+            queryset = queryset.filter(**{f'{field}_lower__lt': high})
+        return queryset
+
+    @classmethod
+    def autocomplete(cls, term, after=None, limit=PAGE_SIZE):
+        """
+        Returns one page of profile cards for usernames starting with
+        ``term`` and the cursor of the next page (None on the last page).
+        Pages are keyed by the last username shown, so deep pages cost the
+        same as the first.
+        """
+        if not IdentityResolver.normalize(term):
+            return [], None
+
+        limit = max(1, min(limit, cls.MAX_PAGE_SIZE))
+        queryset = cls.prefix(CustomUser.objects.filter(is_active=True), term, field='username')
+
+        after = IdentityResolver.normalize(after)
+        if after:
+            queryset = queryset.filter(username_lower__gt=after)
+
+        rows = list(queryset.order_by('username_lower').values_list(*cls.CARD_FIELDS)[:limit + 1])
+        next_after = rows[limit - 1][0] if len(rows) > limit else None
+        return [cls.card(row) for row in rows[:limit]], next_after
+
+    @classmethod
+    def card(cls, row):
+        username, bio, is_verified, avatar, renditions = row
+
+        avatar_url = (renditions or {}).get('sm', {}).get('url')
+        if avatar_url is None and avatar:
+            avatar_url = user_image_storage().url(avatar)
+
+        return {
+            'username': username,
+            'bio': bio,
+            'is_verified': is_verified,
+            'avatar_url': avatar_url,
+        }
@@ -1,11 +1,33 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .identity import IdentityResolver
+from .images import ImagePipeline
 from .models import CustomUser
+from .profile_cache import ProfileCache
+from .tasks import enqueue
+from .user_cache import SessionUserCache
+
+@receiver(post_save, sender=CustomUser)
+def refresh_identity(sender, instance, **kwargs):
+    IdentityResolver.invalidate(instance)
+
+@receiver(post_delete, sender=CustomUser)
+def forget_identity(sender, instance, **kwargs):
+    IdentityResolver.invalidate(instance, deleted=True)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def expire_profile_page(sender, instance, **kwargs):
+    ProfileCache.invalidate(instance)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def expire_session_user(sender, instance, **kwargs):
+    SessionUserCache.invalidate(instance)
 
 @receiver(post_delete, sender=CustomUser)
 def remove_images(sender, instance, **kwargs):
-    if instance.avatar:
-        instance.avatar.delete(save=False)
-    if instance.banner:
-        instance.banner.delete(save=False)
\ No newline at end of file
+    names = ImagePipeline.detach(instance, 'avatar') + ImagePipeline.detach(instance, 'banner')
+    if names:
+        enqueue('delete_files', names=names)
\ No newline at end of file
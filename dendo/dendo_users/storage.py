@@ -0,0 +1,100 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+def user_image_storage():
+    return storages['user_images']
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Filesystem storage that names files after the SHA-256 of their content.
+
+    A file saved as ``user_images/photo.webp`` is stored at
+    ``user_images/ab/cd/abcd...ef.webp``; identical uploads map to the same
+    blob, which is written once and reference counted through StoredBlob.
+    ``delete()`` drops one reference and only removes the file when none
+    are left. Names never change for a given content, so the URLs can be
+    served with far-future cache headers.
+    """
+
+    shard_depth = 2
+    shard_width = 2
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def hashed_name(self, name, digest):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        _, extension = posixpath.splitext(filename)
+        shards = [digest[i * self.shard_width:(i + 1) * self.shard_width] for i in range(self.shard_depth)]
+        return posixpath.join(directory, *shards, f'{digest}{extension.lower()}')
+
+    def _save(self, name, content):
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.location, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            name = self.hashed_name(name, digest.hexdigest())
+            full_path = self.path(name)
+
+            # Reference first, then always (re)place the file: a concurrent
+            # delete() of the same blob either ran before the reference was
+            # taken, and its file removal is undone here, or sees it and
+            # keeps the file.
+            self.add_reference(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return name
+
+    def add_reference(self, name):
+        from .models import StoredBlob
+
+        with transaction.atomic():
+            if StoredBlob.objects.filter(name=name).update(references=F('references') + 1):
+                return
+            try:
+                with transaction.atomic():
+                    StoredBlob.objects.create(name=name, references=1)
+            except IntegrityError:
+                StoredBlob.objects.filter(name=name).update(references=F('references') + 1)
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        if not name:
+            raise ValueError('The name must be given to delete().')
+
+        # The file is removed while the row is still locked, so add_reference()
+        # in a concurrent _save() waits and then re-creates both.
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None:
+                if blob.references > 1:
+                    StoredBlob.objects.filter(pk=blob.pk).update(references=F('references') - 1)
+                    return
+                blob.delete()
+            super().delete(name)
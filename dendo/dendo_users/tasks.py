@@ -0,0 +1,174 @@
+import logging
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .images import ImagePipeline
+from .models import CustomUser, QueuedTask
+from .storage import user_image_storage
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name):
+    """
+    Registers a function as a deferred task under ``name``.
+    Payload values must be JSON serializable.
+    """
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, /, max_attempts=3, **payload):
+    """
+    Schedules a task once the current transaction commits, so a rolled back
+    request never leaves work behind. With TASKS_ALWAYS_EAGER the task runs
+    in-process at commit time instead of being stored.
+    """
+    if name not in registry:
+        raise ValueError(f"Task '{name}' is not registered.")
+
+    if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        transaction.on_commit(partial(registry[name], **payload))
+    else:
+        transaction.on_commit(partial(
+            QueuedTask.objects.create, name=name, payload=payload, max_attempts=max_attempts
+        ))
+
+
+class TaskWorker:
+    """
+    Claims pending tasks and runs them on a bounded thread pool.
+
+    Claiming is a conditional UPDATE on the task row, so several workers can
+    share a queue on any database backend. Failed tasks are retried with
+    exponential backoff until max_attempts is reached.
+
+    Each claim stamps the row with a fresh token, and a task is only deleted
+    or failed by the worker still holding it: once release_stale hands a
+    slow task to another worker, the original one can no longer finish it.
+    The task body itself may still run twice, so tasks should be idempotent
+    and TASKS_LOCK_TIMEOUT well above the slowest of them.
+    """
+
+    def __init__(self, workers=None, batch_size=None):
+        self.workers = workers or getattr(settings, 'TASKS_WORKERS', 4)
+        self.batch_size = batch_size or self.workers * 4
+
+    def claim(self):
+        now = timezone.now()
+        candidates = QueuedTask.objects.filter(
+            status=QueuedTask.PENDING,
+            run_after__lte=now,
+        ).order_by('run_after', 'id').values_list('pk', flat=True)[:self.batch_size]
+
+        claimed = []
+        for pk in candidates:
+            updated = QueuedTask.objects.filter(pk=pk, status=QueuedTask.PENDING).update(
+                status=QueuedTask.RUNNING,
+                locked_at=now,
+                claim_token=uuid.uuid4(),
+                attempts=F('attempts') + 1,
+            )
+            if updated:
+                claimed.append(pk)
+
+        return list(QueuedTask.objects.filter(pk__in=claimed))
+
+    def release_stale(self):
+        timeout = getattr(settings, 'TASKS_LOCK_TIMEOUT', 600)
+        return QueuedTask.objects.filter(
+            status=QueuedTask.RUNNING,
+            locked_at__lt=timezone.now() - timedelta(seconds=timeout),
+        ).update(status=QueuedTask.PENDING, locked_at=None, claim_token=None)
+
+    def execute(self, queued_task):
+        try:
+            func = registry[queued_task.name]
+            func(**queued_task.payload)
+        except Exception:
+            self.fail(queued_task, traceback.format_exc())
+            return False
+        else:
+            deleted, _ = self._claimed(queued_task).delete()
+            if not deleted:
+                logger.warning('Task %s (%s) finished after its claim was released', queued_task.pk, queued_task.name)
+            return True
+
+    @staticmethod
+    def _claimed(queued_task):
+        return QueuedTask.objects.filter(pk=queued_task.pk, claim_token=queued_task.claim_token)
+
+    def _execute_in_thread(self, queued_task):
+        try:
+            return self.execute(queued_task)
+        finally:
+            close_old_connections()
+
+    def fail(self, queued_task, error):
+        claimed = self._claimed(queued_task)
+        if queued_task.attempts >= queued_task.max_attempts:
+            logger.error('Task %s (%s) failed permanently: %s', queued_task.pk, queued_task.name, error)
+            queued_task.status = QueuedTask.FAILED
+        else:
+            delay = getattr(settings, 'TASKS_RETRY_DELAY', 30) * 2 ** (queued_task.attempts - 1)
+            logger.warning('Task %s (%s) failed, retrying in %ss', queued_task.pk, queued_task.name, delay)
+            queued_task.status = QueuedTask.PENDING
+            queued_task.run_after = timezone.now() + timedelta(seconds=delay)
+
+        queued_task.locked_at = None
+        queued_task.claim_token = None
+        queued_task.last_error = error
+        claimed.update(
+            status=queued_task.status,
+            run_after=queued_task.run_after,
+            locked_at=None,
+            claim_token=None,
+            last_error=error,
+        )
+
+    def run_pending(self):
+        """
+        Runs one batch of due tasks and returns how many were processed.
+        """
+        self.release_stale()
+        batch = self.claim()
+        if not batch:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dendo-task') as pool:
+            list(pool.map(self._execute_in_thread, batch))
+
+        return len(batch)
+
+
+@task('delete_files')
+def delete_files(names):
+    storage = user_image_storage()
+    for name in names:
+        storage.delete(name)
+
+
+@task('process_user_image')
+def process_user_image(user_id, field, name):
+    user = CustomUser.objects.filter(pk=user_id).first()
+    if user is None or getattr(user, field).name != name:
+        return
+
+    storage = getattr(user, field).storage
+    with storage.open(name) as original:
+        ImagePipeline.apply(user, field, original)
+
+    user.save(update_fields=[field, f'{field}_renditions'])
+    storage.delete(name)
@@ -1,12 +1,51 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import queue
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model, authenticate
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from dendo.log import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+from dendo.routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, replica_reads
 
+from . import hashing
+from .admin import CustomUserAdmin
+from .checks import check_usernames
 from .forms import (
     SignUpForm,
     LogInForm,
     UserEditForm,
     PasswordUpdateForm,
 )
+from .identity import IdentityResolver
+from .images import AVATAR_SIZES
+from .last_login import LastLogin, LastLoginBuffer
+from .models import QueuedTask, StoredBlob
+from .profile_cache import ProfileCache
+from .storage import user_image_storage
+from .search import prefix_bounds
+from .user_cache import SessionUserCache
+from .utils import UserHelper
+from .tasks import TaskWorker, enqueue, registry, task
+from .throttling import LoginThrottle
 # Create your tests here.
 
 USERNAME = 'newuser'
@@ -134,4 +173,809 @@ class LoginFormTest(BaseUserTestCase):
         user_with_email = authenticate(username=EMAIL, password=PASSWORD)
         self.assertEqual(user_with_username, self.user)
         self.assertEqual(user_with_email, self.user)
-        self.assertEqual(authenticate(username='', password=''), None)
\ No newline at end of file
+        self.assertEqual(authenticate(username='', password=''), None)
+
+class IdentityResolverTest(BaseUserTestCase):
+    def lookup_queries(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('SELECT') and '"CustomUsers"' in q['sql']]
+
+    def test_signup_resolves_each_identifier_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('dendo_users:signup_page'), {
+                'username': 'another',
+                'email': 'another@example.com',
+                'password': PASSWORD,
+                'confirm_password': PASSWORD,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(self.lookup_queries(queries)), 2)
+
+    def test_memo_is_invalidated_on_save(self):
+        with IdentityResolver.memo():
+            self.assertEqual(IdentityResolver.resolve(USERNAME), self.user)
+            with self.assertNumQueries(0):
+                IdentityResolver.resolve(EMAIL)
+
+            self.user.username = 'renamed'
+            self.user.save()
+            with self.assertNumQueries(0):
+                self.assertEqual(IdentityResolver.resolve('renamed'), self.user)
+            self.assertIsNone(IdentityResolver.resolve(USERNAME))
+
+    def test_lookup_is_case_insensitive(self):
+        self.assertEqual(IdentityResolver.resolve(USERNAME.upper()), self.user)
+        self.assertEqual(IdentityResolver.resolve(f'  {EMAIL.title()} '), self.user)
+
+    def test_signup_rejects_username_differing_in_case(self):
+        form = create_test_form(SignUpForm, username=USERNAME.capitalize(), email='fresh@example.com')
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+
+    def test_plus_addressed_email_resolves_and_logs_in(self):
+        user = get_user_model().objects.create_user(username='bob', email='bob+x@example.com', password=PASSWORD)
+        self.assertEqual(IdentityResolver.resolve('Bob+X@example.com'), user)
+        self.assertEqual(authenticate(username='bob+x@example.com', password=PASSWORD), user)
+
+    def test_signup_rejects_plus_addressed_email_differing_in_case(self):
+        get_user_model().objects.create_user(username='bob', email='bob+x@example.com', password=PASSWORD)
+        form = create_test_form(SignUpForm, username='another', email='BOB+x@example.com')
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+    def test_usernames_cannot_contain_at_sign(self):
+        user = get_user_model()(username='bob@home', email='bob@example.com')
+        user.set_password(PASSWORD)
+        with self.assertRaises(ValidationError) as raised:
+            user.full_clean()
+        self.assertIn('username', raised.exception.message_dict)
+
+    def test_check_reports_existing_usernames_with_at_sign(self):
+        self.assertEqual(check_usernames(None, databases=['default']), [])
+
+        get_user_model().objects.create_user(username='bob@home', email='bob@example.com', password=PASSWORD)
+        warnings = check_usernames(None, databases=['default'])
+        self.assertEqual([warning.id for warning in warnings], ['dendo_users.W001'])
+        self.assertIn('bob@home', warnings[0].msg)
+
+    @override_settings(IDENTITY_CACHE='default', DATABASE_REPLICA='replica')
+    def test_replica_reads_are_not_cached(self):
+        cache.clear()
+        with mock.patch.object(IdentityResolver, '_lookup', return_value=self.user), IdentityResolver.memo():
+            with replica_reads():
+                self.assertEqual(IdentityResolver.resolve(USERNAME), self.user)
+            self.assertEqual(IdentityResolver._lookup.call_count, 1)
+
+            IdentityResolver.resolve(USERNAME)
+            self.assertEqual(IdentityResolver._lookup.call_count, 2)
+
+    @override_settings(IDENTITY_CACHE='default')
+    def test_shared_cache_is_invalidated_on_delete(self):
+        self.assertEqual(IdentityResolver.resolve(USERNAME), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(IdentityResolver.resolve(USERNAME), self.user)
+
+        self.user.delete()
+        self.assertIsNone(IdentityResolver.resolve(USERNAME))
+
+
+class UserLoadingTest(BaseUserTestCase):
+    def test_named_querysets_defer_unused_columns(self):
+        user = get_user_model().objects.for_auth().get(pk=self.user.pk)
+        self.assertEqual(user.get_deferred_fields(), {'bio', 'avatar', 'banner', 'avatar_renditions', 'banner_renditions', 'is_verified', 'date_joined', 'updated_at'})
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.check_password(PASSWORD))
+
+    def test_changed_fields_compares_loaded_values(self):
+        user = get_user_model().objects.for_profile_card().get(pk=self.user.pk)
+        self.assertEqual(user.changed_fields(), set())
+
+        user.bio = 'Changed'
+        user.avatar = 'user_images/other.webp'
+        self.assertEqual(user.changed_fields(), {'bio', 'avatar'})
+        self.assertIsNone(get_user_model()(username='unsaved').changed_fields())
+
+
+class DirtyFieldTest(BaseUserTestCase):
+    def user_updates(self, func, *args):
+        with CaptureQueriesContext(connection) as queries:
+            func(*args)
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "CustomUsers"')]
+
+    def test_unchanged_instance_is_not_written(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            user.save()
+            self.user.save()
+
+    def test_profile_edit_writes_changed_columns_only(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        form = create_test_form(UserEditForm, user=user, username='', bio='Another bio')
+        self.assertTrue(form.is_valid(), form.errors)
+
+        updates = self.user_updates(form.save)
+        self.assertEqual(len(updates), 1)
+        set_clause = updates[0].split(' WHERE ')[0]
+        self.assertIn('"bio"', set_clause)
+        self.assertIn('"updated_at"', set_clause)
+        self.assertNotIn('"password"', set_clause)
+
+        form = create_test_form(UserEditForm, user=user, username='', bio='Another bio')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self.user_updates(form.save), [])
+
+    def test_password_update_writes_password_only(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        updates = self.user_updates(UserHelper.update_password, user, 'another-password')
+
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"updated_at"', updates[0])
+        self.assertNotIn('"bio"', updates[0])
+        self.assertTrue(get_user_model().objects.get(pk=self.user.pk).check_password('another-password'))
+
+    def test_deferred_fields_are_tracked_once_loaded(self):
+        user = get_user_model().objects.for_auth().get(pk=self.user.pk)
+        self.assertEqual(user.bio, BIO)
+        user.bio = 'Changed'
+
+        updates = self.user_updates(user.save)
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"email"', updates[0])
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).bio, 'Changed')
+
+    def test_deferred_fields_assigned_without_reading_are_written(self):
+        user = UserHelper.get_user(USERNAME)
+        self.assertIn('bio', user.get_deferred_fields())
+        user.bio = 'Changed'
+        user.is_verified = True
+
+        updates = self.user_updates(user.save)
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"email"', updates[0])
+
+        stored = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual(stored.bio, 'Changed')
+        self.assertTrue(stored.is_verified)
+        self.assertEqual(user.changed_fields(), set())
+
+
+class LastLoginTest(BaseUserTestCase):
+    def user_updates(self, logins):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(logins):
+                self.client.post(reverse('dendo_users:login_page'), {'username_or_email': USERNAME, 'password': PASSWORD})
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "CustomUsers"')]
+
+    def test_every_login_writes_by_default(self):
+        self.assertEqual(len(self.user_updates(3)), 3)
+
+    @override_settings(LAST_LOGIN_UPDATE='throttled', LAST_LOGIN_CACHE='')
+    def test_throttled_writes_once_per_interval(self):
+        self.assertEqual(len(self.user_updates(3)), 1)
+        self.assertIsNotNone(get_user_model().objects.get(pk=self.user.pk).last_login)
+
+    @override_settings(LAST_LOGIN_UPDATE='throttled', LAST_LOGIN_CACHE='default')
+    def test_cache_claim_limits_stale_instances(self):
+        self.addCleanup(cache.clear)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                # As if every login read a cached user with the old last_login
+                LastLogin.record(None, get_user_model()(pk=self.user.pk, last_login=None))
+        self.assertEqual(len(queries.captured_queries), 1)
+
+    def test_buffer_coalesces_logins(self):
+        buffer = LastLoginBuffer(flush_interval=60)
+        first, latest = timezone.now() - timezone.timedelta(minutes=1), timezone.now()
+        buffer.add(self.user.pk, latest)
+        buffer.add(self.user.pk, first)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).last_login, latest)
+
+    def test_updated_at_moves_only_on_public_changes(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        updated_at = user.updated_at
+
+        user.set_password('another-password')
+        user.save()
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).updated_at, updated_at)
+
+        user.bio = 'Changed'
+        user.save()
+        self.assertGreater(get_user_model().objects.get(pk=self.user.pk).updated_at, updated_at)
+
+
+class LoginViewTest(BaseUserTestCase):
+    def test_login_hashes_password_once(self):
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=PBKDF2PasswordHasher.verify) as verify:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('dendo_users:login_page'), {
+                    'username_or_email': USERNAME,
+                    'password': PASSWORD,
+                })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(verify.call_count, 1)
+        user_selects = [q for q in queries if q['sql'].startswith('SELECT') and 'FROM "CustomUsers"' in q['sql']]
+        self.assertEqual(len(user_selects), 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+
+class PasswordHashingTest(BaseUserTestCase):
+    def test_changed_iterations_rehash_on_login(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.assertTrue(UserHelper.authenticate_user(USERNAME, PASSWORD))
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_password_update_form_hashes_once(self):
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=PBKDF2PasswordHasher.verify) as verify:
+            form = create_test_form(PasswordUpdateForm, old_password=PASSWORD, new_password=PASSWORD, current_password_hash=self.user.password)
+            self.assertFalse(form.is_valid())
+
+        self.assertIn('new_password', form.errors)
+        self.assertEqual(verify.call_count, 1)
+
+    @override_settings(PASSWORD_HASH_EXECUTOR='thread', PASSWORD_HASH_WORKERS=2)
+    def test_thread_executor(self):
+        self.addCleanup(hashing.shutdown)
+        self.assertTrue(self.user.check_password(PASSWORD))
+        self.assertFalse(self.user.check_password('wrong_password'))
+
+
+@override_settings(LOGIN_THROTTLE_IDENTIFIER_LIMIT=3, LOGIN_THROTTLE_IP_LIMIT=5)
+class LoginThrottleTest(BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        LoginThrottle.clear_memory()
+
+    def login(self, username_or_email, password, **extra):
+        return self.client.post(reverse('dendo_users:login_page'), {
+            'username_or_email': username_or_email,
+            'password': password,
+        }, **extra)
+
+    def test_locked_identifier_is_rejected_before_lookup_and_hash(self):
+        for _ in range(3):
+            self.login(USERNAME, 'wrong_password')
+
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True) as verify:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.login(USERNAME, PASSWORD)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors.as_data()['__all__'][0].code, 'throttled')
+        self.assertEqual(verify.call_count, 0)
+        self.assertFalse([q for q in queries if 'FROM "CustomUsers"' in q['sql']])
+
+    def test_ip_limit_spans_identifiers(self):
+        for index in range(5):
+            self.login(f'someone{index}', 'wrong_password')
+
+        response = self.login(USERNAME, PASSWORD)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.login(USERNAME, PASSWORD, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(LOGIN_THROTTLE_CACHE='')
+    def test_backend_uses_in_process_fallback(self):
+        request = RequestFactory().post('/')
+        for _ in range(3):
+            self.assertIsNone(authenticate(request, username=USERNAME, password='wrong_password'))
+
+        self.assertIsNone(authenticate(request, username=USERNAME, password=PASSWORD))
+        self.assertEqual(LoginThrottle.check(None, 'someone_else'), 0)
+
+
+class AsyncAuthViewTest(BaseUserTestCase):
+    async def test_async_login(self):
+        response = await self.async_client.post(reverse('dendo_users:async_login_page'), {
+            'username_or_email': EMAIL,
+            'password': PASSWORD,
+        })
+        self.assertEqual(response.status_code, 302)
+        session = await self.async_client.asession()
+        self.assertEqual(int(await session.aget('_auth_user_id')), self.user.pk)
+
+    async def test_async_login_invalid_password(self):
+        response = await self.async_client.post(reverse('dendo_users:async_login_page'), {
+            'username_or_email': EMAIL,
+            'password': 'wrong_password',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+
+    async def test_async_signup(self):
+        response = await self.async_client.post(reverse('dendo_users:async_signup_page'), {
+            'username': 'asyncuser',
+            'email': 'asyncuser@example.com',
+            'password': PASSWORD,
+            'confirm_password': PASSWORD,
+        })
+        self.assertEqual(response.status_code, 302)
+        user = await get_user_model().objects.aget(username='asyncuser')
+        self.assertTrue(await sync_to_async(user.check_password)(PASSWORD))
+
+    async def test_async_update_password(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('dendo_users:async_password_reset_page', kwargs={'username': USERNAME}),
+            {'old_password': PASSWORD, 'new_password': 'newpassword'},
+        )
+        self.assertEqual(response.status_code, 302)
+        await self.user.arefresh_from_db()
+        self.assertTrue(await sync_to_async(self.user.check_password)('newpassword'))
+
+
+def create_test_image(name='photo.jpg', size=(1200, 900)):
+    image = Image.new('RGB', size, 'orange')
+    exif = image.getexif()
+    exif[0x010f] = 'Test Camera'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImagePipelineTest(BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, TASKS_ALWAYS_EAGER=True, ACTIVITY_LOG_MODE='sync')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_avatar_upload_creates_renditions(self):
+        form = create_test_form(UserEditForm, user=self.user, avatar=create_test_image())
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+        self.user.refresh_from_db()
+
+        self.assertEqual(set(self.user.avatar_renditions), set(AVATAR_SIZES))
+        for label, size in AVATAR_SIZES.items():
+            rendition = self.user.avatar_renditions[label]
+            self.assertEqual((rendition['width'], rendition['height']), (size, size))
+            with self.user.avatar.storage.open(rendition['name']) as stored, Image.open(stored) as image:
+                self.assertEqual(image.size, (size, size))
+                self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(self.user.get_rendition_url('avatar', 'sm'), self.user.avatar_renditions['sm']['url'])
+
+    def test_replacing_banner_removes_old_files(self):
+        form = create_test_form(UserEditForm, user=self.user, banner=create_test_image(size=(3000, 1000)))
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+        self.user.refresh_from_db()
+        storage = self.user.banner.storage
+        old_names = [self.user.banner.name] + [r['name'] for r in self.user.banner_renditions.values()]
+        self.assertEqual(self.user.banner_renditions['display']['width'], 1500)
+
+        form = create_test_form(UserEditForm, user=self.user, username='', bio='', banner=create_test_image('second.jpg', size=(800, 400)))
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+        self.user.refresh_from_db()
+
+        for name in old_names:
+            self.assertFalse(storage.exists(name))
+        self.assertEqual(self.user.banner_renditions['display']['width'], 800)
+
+    def test_deferred_save_removes_old_files(self):
+        form = create_test_form(UserEditForm, user=self.user, username='', bio='', banner=create_test_image(size=(3000, 1000)))
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+        self.user.refresh_from_db()
+        storage = self.user.banner.storage
+        old_names = [self.user.banner.name] + [r['name'] for r in self.user.banner_renditions.values()]
+
+        form = create_test_form(UserEditForm, user=self.user, username='', bio='', banner=create_test_image('second.jpg', size=(800, 400)))
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            user = form.save(commit=False)
+            user.save()
+            form.save_images()
+        self.user.refresh_from_db()
+
+        for name in old_names:
+            self.assertFalse(storage.exists(name))
+        self.assertEqual(self.user.banner_renditions['display']['width'], 800)
+
+    def test_delete_racing_a_save_of_the_same_content_keeps_the_file(self):
+        storage = user_image_storage()
+        name = storage.save('user_images/note.txt', ContentFile(b'same bytes'))
+        add_reference = storage.add_reference
+
+        def delete_first(blob_name):
+            # The last owner deletes the blob just before the new reference lands.
+            storage.delete(blob_name)
+            add_reference(blob_name)
+
+        with mock.patch.object(storage, 'add_reference', side_effect=delete_first):
+            self.assertEqual(storage.save('user_images/note.txt', ContentFile(b'same bytes')), name)
+
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).references, 1)
+
+    def test_identical_uploads_share_one_blob(self):
+        other = get_user_model().objects.create_user(username='other', email='other@example.com', password=PASSWORD)
+        for user in (self.user, other):
+            form = create_test_form(UserEditForm, user=user, username='', bio='', avatar=create_test_image())
+            self.assertTrue(form.is_valid())
+            with self.captureOnCommitCallbacks(execute=True):
+                form.save()
+            user.refresh_from_db()
+
+        self.assertEqual(self.user.avatar.name, other.avatar.name)
+        self.assertEqual(StoredBlob.objects.get(name=other.avatar.name).references, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertTrue(self.user.avatar.storage.exists(self.user.avatar.name))
+        self.assertEqual(StoredBlob.objects.get(name=self.user.avatar.name).references, 1)
+
+        name, storage = self.user.avatar.name, self.user.avatar.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(StoredBlob.objects.exists())
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        self.calls = []
+        task('test_record')(lambda value: self.calls.append(value))
+        self.addCleanup(registry.pop, 'test_record')
+
+    def test_enqueue_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue('test_record', value=1)
+            self.assertFalse(QueuedTask.objects.exists())
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(QueuedTask.objects.get().payload, {'value': 1})
+
+    def test_worker_runs_and_removes_task(self):
+        QueuedTask.objects.create(name='test_record', payload={'value': 2})
+        worker = TaskWorker(workers=1)
+
+        for queued_task in worker.claim():
+            self.assertTrue(worker.execute(queued_task))
+
+        self.assertEqual(self.calls, [2])
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_failing_task_is_retried_then_marked_failed(self):
+        def explode():
+            raise RuntimeError('boom')
+        task('test_explode')(explode)
+        self.addCleanup(registry.pop, 'test_explode')
+        queued_task = QueuedTask.objects.create(name='test_explode', max_attempts=2)
+        worker = TaskWorker(workers=1)
+
+        for expected_status in (QueuedTask.PENDING, QueuedTask.FAILED):
+            QueuedTask.objects.filter(pk=queued_task.pk).update(run_after=timezone.now())
+            claimed = worker.claim()
+            self.assertEqual(len(claimed), 1)
+            self.assertFalse(worker.execute(claimed[0]))
+            queued_task.refresh_from_db()
+            self.assertEqual(queued_task.status, expected_status)
+
+        self.assertIn('boom', queued_task.last_error)
+
+    @override_settings(TASKS_LOCK_TIMEOUT=60)
+    def test_released_task_is_not_finished_by_its_old_worker(self):
+        QueuedTask.objects.create(name='test_record', payload={'value': 3})
+        slow, fast = TaskWorker(workers=1), TaskWorker(workers=1)
+        stale = slow.claim()[0]
+
+        QueuedTask.objects.update(locked_at=timezone.now() - timezone.timedelta(seconds=120))
+        self.assertEqual(fast.release_stale(), 1)
+        current = fast.claim()[0]
+        self.assertNotEqual(current.claim_token, stale.claim_token)
+
+        slow.execute(stale)
+        slow.fail(stale, 'late failure')
+        current.refresh_from_db()
+        self.assertEqual(current.status, QueuedTask.RUNNING)
+        self.assertEqual(current.last_error, '')
+
+        self.assertTrue(fast.execute(current))
+        self.assertFalse(QueuedTask.objects.exists())
+
+
+class UserProfileViewTest(BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('dendo_users:user_page', kwargs={'username': USERNAME})
+
+    def test_repeat_visit_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        # Only the updated_at probe.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_queryset_update_is_not_served_stale(self):
+        self.client.get(self.url)
+        self.assertIsNotNone(ProfileCache.get(USERNAME))
+
+        get_user_model().objects.filter(pk=self.user.pk).update(bio='Updated in bulk.', updated_at=timezone.now())
+        self.assertIsNone(ProfileCache.get(USERNAME))
+
+    def test_cached_page_is_dropped_on_save(self):
+        self.client.get(self.url)
+        self.assertIsNotNone(ProfileCache.get(USERNAME))
+
+        self.user.bio = 'Updated bio.'
+        self.user.save()
+        self.assertIsNone(ProfileCache.get(USERNAME))
+
+    @override_settings(PROFILE_CACHE_TIMEOUT=600, COUNTER_CACHE_TIMEOUT=30)
+    def test_cached_page_expires_with_the_counters(self):
+        with mock.patch.object(ProfileCache, 'set', wraps=ProfileCache.set) as cache_set:
+            self.client.get(self.url)
+        self.assertEqual(cache_set.call_args.args[2], 30)
+
+    def test_unknown_profile_is_not_found(self):
+        response = self.client.get(reverse('dendo_users:user_page', kwargs={'username': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class ReplicaRoutingTest(BaseUserTestCase):
+    def test_reads_use_replica_only_when_opted_in(self):
+        router = PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(get_user_model()))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(get_user_model()), 'replica')
+
+    def test_write_pins_client_to_primary(self):
+        router = PrimaryReplicaRouter()
+        seen = []
+
+        def view(request):
+            with replica_reads():
+                seen.append(router.db_for_read(get_user_model()))
+                router.db_for_write(get_user_model())
+                seen.append(router.db_for_read(get_user_model()))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(seen, ['replica', None])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        seen.clear()
+        ReplicaRoutingMiddleware(view)(request)
+        self.assertEqual(seen, [None, None])
+
+
+@override_settings(AUTH_USER_CACHE='default', IDENTITY_CACHE='default')
+class SessionUserCacheTest(BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('dendo_users:user_edit_page', kwargs={'username': USERNAME})
+
+    def test_authenticated_cached_page_needs_no_queries(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_password_change_drops_cached_user(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.assertIsNotNone(SessionUserCache.get(self.user.pk))
+
+        UserHelper.update_password(self.user, 'a-new-password')
+        self.assertIsNone(SessionUserCache.get(self.user.pk))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class RequestTimingTest(BaseUserTestCase):
+    def get_metrics(self, method, url, data=None):
+        with self.assertLogs('dendo.perf', 'INFO') as logs:
+            response = getattr(self.client, method)(url, data)
+        return response, logs.records[-1].data
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_profile_page_metrics(self):
+        response, metrics = self.get_metrics('get', reverse('dendo_users:user_page', kwargs={'username': USERNAME}))
+
+        self.assertEqual(metrics['url_name'], 'dendo_users:user_page')
+        self.assertGreater(metrics['db_queries'], 0)
+        self.assertGreater(metrics['template_ms'], 0)
+        # The rendered page and the profile's counters
+        self.assertEqual(metrics['cache_misses'], 2)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_login_records_hash_time(self):
+        _, metrics = self.get_metrics('post', reverse('dendo_users:login_page'), {
+            'username_or_email': USERNAME,
+            'password': PASSWORD,
+        })
+        self.assertEqual(metrics['status'], 302)
+        self.assertGreater(metrics['hash_ms'], 0)
+
+    def test_perf_report_aggregates_per_url_name(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.logs', delete=False) as log_file:
+            for duration in range(1, 101):
+                log_file.write(json.dumps({
+                    'event': 'request', 'time': 1, 'path': '/', 'url_name': 'dendo_users:login_page',
+                    'duration_ms': duration, 'db_queries': 2, 'db_ms': 1, 'cache_hits': 1,
+                    'cache_misses': 1, 'hash_ms': 0, 'template_ms': 1,
+                }) + '\n')
+        self.addCleanup(Path(log_file.name).unlink)
+
+        out = io.StringIO()
+        call_command('perf_report', log_file.name, stdout=out)
+        row = out.getvalue().splitlines()[1].split()
+        self.assertEqual(row[:5], ['dendo_users:login_page', '100', '50.0', '95.0', '99.0'])
+
+
+class LoggingPipelineTest(TestCase):
+    def make_record(self, level=logging.INFO, **extra):
+        record = logging.LogRecord('dendo.perf', level, __file__, 1, 'hello %s', ('world',), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter_merges_data(self):
+        line = JsonFormatter().format(self.make_record(data={'duration_ms': 3}))
+        self.assertEqual(json.loads(line)['message'], 'hello world')
+        self.assertEqual(json.loads(line)['duration_ms'], 3)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(self.make_record())
+        handler.handle(self.make_record())
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_sampling_keeps_warnings(self):
+        sampling = SamplingFilter(rate=0)
+        self.assertFalse(sampling.filter(self.make_record()))
+        self.assertTrue(sampling.filter(self.make_record(level=logging.WARNING)))
+
+
+class UserSearchViewTest(BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ('NewComer', 'newsroom', 'other'):
+            get_user_model().objects.create_user(username=name, email=f'{name}@example.com', password=PASSWORD)
+        get_user_model().objects.filter(username='newsroom').update(is_active=False)
+
+    def search(self, **params):
+        return self.client.get(reverse('dendo_users:user_search'), params).json()
+
+    def test_prefix_search_is_paginated(self):
+        page = self.search(q='NEW', limit=1)
+        self.assertEqual([card['username'] for card in page['results']], ['NewComer'])
+        self.assertEqual(set(page['results'][0]), {'username', 'bio', 'is_verified', 'avatar_url'})
+
+        page = self.search(q='NEW', limit=1, after=page['next'])
+        self.assertEqual([card['username'] for card in page['results']], [USERNAME])
+        self.assertIsNone(page['next'])
+
+    def test_search_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search(q='oth')['results'][0]['username'], 'other')
+
+        self.assertEqual(self.search(q='')['results'], [])
+
+    def test_prefix_bounds_at_the_end_of_unicode(self):
+        self.assertEqual(prefix_bounds('ab'), ('ab', 'ac'))
+        self.assertEqual(prefix_bounds('a\U0010ffff'), ('a\U0010ffff', 'b'))
+        self.assertEqual(prefix_bounds('\U0010ffff'), ('\U0010ffff', None))
+        self.assertEqual(prefix_bounds('a\ud7ff'), ('a\ud7ff', 'a\ue000'))
+
+        self.assertEqual(self.search(q='new\U0010ffff')['results'], [])
+        self.assertEqual(self.search(q='\U0010ffff')['results'], [])
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(username='admin', email='admin@example.com', password=PASSWORD)
+        for name in ('alice', 'Bob', 'carol', 'dave'):
+            get_user_model().objects.create_user(username=name, email=f'{name}@example.com', password=PASSWORD)
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:dendo_users_customuser_changelist')
+
+    @mock.patch.object(CustomUserAdmin, 'list_per_page', 2)
+    def test_pages_by_username_without_offset(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        cl = response.context['cl']
+        self.assertEqual([user.username for user in cl.result_list], ['Bob', 'admin'])
+        self.assertEqual(cl.result_count, 5)
+        self.assertFalse([q for q in queries if 'OFFSET' in q['sql']])
+
+        response = self.client.get(self.url + cl.next_page_url)
+        self.assertEqual([user.username for user in response.context['cl'].result_list], ['alice', 'carol'])
+
+    def test_search_matches_prefix_case_insensitively(self):
+        response = self.client.get(self.url, {'q': 'bo'})
+        self.assertEqual([user.username for user in response.context['cl'].result_list], ['Bob'])
+
+        response = self.client.get(self.url, {'q': 'CAROL@'})
+        self.assertEqual([user.username for user in response.context['cl'].result_list], ['carol'])
+
+    def test_sorting_by_another_column_uses_numbered_pages(self):
+        response = self.client.get(self.url, {'o': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['cl'].keyset)
+
+
+class UserImportExportTest(BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = Path(directory)
+
+    def test_import_skips_duplicates_and_invalid_rows(self):
+        source = self.directory / 'users.csv'
+        password_hash = make_password(PASSWORD)
+        source.write_text(
+            'username,email,password,bio\n'
+            f'alice,alice@example.com,{password_hash},Hi\n'
+            f'Alice,other@example.com,{password_hash},\n'
+            f'{USERNAME.upper()},fresh@example.com,{password_hash},\n'
+            f'bob,{EMAIL.upper()},{password_hash},\n'
+            f'carol@example.com,carol@example.com,{password_hash},\n'
+            f'dave,dave@example.com,{password_hash},\n'
+        )
+
+        call_command('import_users', str(source), '--hashed', '--batch-size', '2', stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(
+            set(get_user_model().objects.values_list('username', flat=True)),
+            {USERNAME, 'alice', 'dave'},
+        )
+        alice = get_user_model().objects.get(username='alice')
+        self.assertEqual(alice.bio, 'Hi')
+        self.assertTrue(alice.check_password(PASSWORD))
+
+    def test_rows_registered_during_import_report_their_line(self):
+        source = self.directory / 'users.csv'
+        source.write_text('username,email\nalice,alice@example.com\nbob,bob@example.com\n')
+
+        user_model = get_user_model()
+        save = user_model.save
+
+        def save_unless_bob(user, *args, **kwargs):
+            # bob registered between the batch check and the insert.
+            if user.username == 'bob':
+                raise IntegrityError
+            return save(user, *args, **kwargs)
+
+        stderr = io.StringIO()
+        with mock.patch.object(user_model.objects, 'bulk_create', side_effect=IntegrityError), \
+                mock.patch.object(user_model, 'save', autospec=True, side_effect=save_unless_bob):
+            call_command('import_users', str(source), stdout=io.StringIO(), stderr=stderr)
+
+        self.assertTrue(get_user_model().objects.filter(username='alice').exists())
+        self.assertIn('Row 2: skipped, username or email already registered.', stderr.getvalue())
+
+    def test_export_streams_jsonl(self):
+        target = self.directory / 'users.jsonl'
+        call_command('export_users', str(target), '--fields', 'username,email', stderr=io.StringIO())
+
+        rows = [json.loads(line) for line in target.read_text().splitlines()]
+        self.assertEqual(rows, [{'username': USERNAME, 'email': EMAIL}])
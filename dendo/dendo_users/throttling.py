@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .identity import IdentityResolver
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindow:
+    """
+    Approximate sliding window counter.
+
+    Counts are kept per fixed window; the current rate is the count of the
+    current window plus the previous window's count weighted by how much of
+    it still overlaps the sliding window. Two integers per key, no list of
+    timestamps.
+    """
+
+    def __init__(self, window):
+        self.window = window
+
+    def slot(self, now):
+        index = math.floor(now / self.window)
+        elapsed = (now - index * self.window) / self.window
+        return index, elapsed
+
+    def estimate(self, previous, current, elapsed):
+        return previous * (1 - elapsed) + current
+
+
+class CacheCounter:
+    def __init__(self, cache, window):
+        self.cache = cache
+        self.window = window
+
+    def counts(self, key, index):
+        values = self.cache.get_many([f'{key}:{index - 1}', f'{key}:{index}'])
+        return values.get(f'{key}:{index - 1}', 0), values.get(f'{key}:{index}', 0)
+
+    def increment(self, key, index):
+        slot_key = f'{key}:{index}'
+        if not self.cache.add(slot_key, 1, self.window * 2):
+            self.cache.incr(slot_key)
+
+    def reset(self, key, index):
+        self.cache.delete_many([f'{key}:{index - 1}', f'{key}:{index}'])
+
+
+class MemoryCounter:
+    """
+    Per-process counter used when no cache is configured or the cache is
+    unreachable. Limits are then enforced per worker process.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.slots = {}
+        self.lock = threading.Lock()
+
+    def counts(self, key, index):
+        with self.lock:
+            slots = self.slots.get(key, {})
+            return slots.get(index - 1, 0), slots.get(index, 0)
+
+    def increment(self, key, index):
+        with self.lock:
+            slots = self.slots.setdefault(key, {})
+            slots[index] = slots.get(index, 0) + 1
+            for stale in [slot for slot in slots if slot < index - 1]:
+                del slots[stale]
+
+    def reset(self, key, index):
+        with self.lock:
+            self.slots.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.slots.clear()
+
+
+class LoginThrottle:
+    """
+    Limits failed logins per client IP and per username/email.
+
+    ``check()`` runs before the user lookup and the password hash, so once
+    a limit is reached further attempts cost two cache reads. Only failures
+    are counted; a successful login clears the identifier's counter.
+
+    Counters live in the LOGIN_THROTTLE_CACHE cache so every process shares
+    them, with an in-process fallback when that alias is empty or the
+    cache errors. The client IP is REMOTE_ADDR, so a reverse proxy must set
+    it to the real client address.
+    """
+
+    KEY_PREFIX = 'dendo_users:login_throttle'
+
+    _memory = None
+    _memory_lock = threading.Lock()
+
+    @staticmethod
+    def _window():
+        return getattr(settings, 'LOGIN_THROTTLE_WINDOW', 300)
+
+    @classmethod
+    def _limits(cls):
+        return {
+            'ip': getattr(settings, 'LOGIN_THROTTLE_IP_LIMIT', 50),
+            'identifier': getattr(settings, 'LOGIN_THROTTLE_IDENTIFIER_LIMIT', 10),
+        }
+
+    @classmethod
+    def _memory_counter(cls):
+        with cls._memory_lock:
+            if cls._memory is None or cls._memory.window != cls._window():
+                cls._memory = MemoryCounter(cls._window())
+            return cls._memory
+
+    @classmethod
+    def _counters(cls):
+        alias = getattr(settings, 'LOGIN_THROTTLE_CACHE', 'default')
+        if alias:
+            yield CacheCounter(caches[alias], cls._window())
+        yield cls._memory_counter()
+
+    @classmethod
+    def _call(cls, method, *args):
+        for counter in cls._counters():
+            try:
+                return getattr(counter, method)(*args)
+            except Exception:
+                if isinstance(counter, MemoryCounter):
+                    raise
+                logger.warning('Login throttle cache unavailable, using the in-process counter', exc_info=True)
+
+    @classmethod
+    def _keys(cls, ip, identifier):
+        keys = {}
+        if ip:
+            keys['ip'] = f'{cls.KEY_PREFIX}:ip:{ip}'
+        identifier = IdentityResolver.normalize(identifier)
+        if identifier:
+            digest = hashlib.sha1(identifier.encode('utf-8')).hexdigest()
+            keys['identifier'] = f'{cls.KEY_PREFIX}:id:{digest}'
+        return keys
+
+    @staticmethod
+    def client_ip(request):
+        if request is None:
+            return None
+        return request.META.get('REMOTE_ADDR')
+
+    @classmethod
+    def check(cls, ip, identifier):
+        """
+        Returns the number of seconds until another attempt is allowed, or
+        0 when the attempt may proceed.
+        """
+        window = SlidingWindow(cls._window())
+        index, elapsed = window.slot(time.time())
+        limits = cls._limits()
+
+        for scope, key in cls._keys(ip, identifier).items():
+            limit = limits[scope]
+            if not limit:
+                continue
+            previous, current = cls._call('counts', key, index)
+            if window.estimate(previous, current, elapsed) >= limit:
+                # Wait until enough of the older counts slide out of the window.
+                if current >= limit:
+                    wait = (1 - elapsed) + (1 - limit / current)
+                else:
+                    wait = (1 - (limit - current) / previous) - elapsed
+                return max(1, math.ceil(wait * window.window))
+        return 0
+
+    @classmethod
+    def register_failure(cls, ip, identifier):
+        index, _ = SlidingWindow(cls._window()).slot(time.time())
+        for key in cls._keys(ip, identifier).values():
+            cls._call('increment', key, index)
+
+    @classmethod
+    def reset(cls, identifier):
+        index, _ = SlidingWindow(cls._window()).slot(time.time())
+        key = cls._keys(None, identifier).get('identifier')
+        if key:
+            cls._call('reset', key, index)
+
+    @classmethod
+    def clear_memory(cls):
+        with cls._memory_lock:
+            if cls._memory is not None:
+                cls._memory.clear()
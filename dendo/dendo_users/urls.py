@@ -9,7 +9,11 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login_page'),
     path('signup/', SignupView.as_view(), name='signup_page'),
     path('logout/', logout_view, name='logout_page'),
+    path('search/', UserSearchView.as_view(), name='user_search'),
     path('profile/<str:username>/', UserProfileView.as_view(), name='user_page'),
     path('profile/<str:username>/update-password/', UpdatePasswordView.as_view(), name='password_reset_page'),
     path('profile/<str:username>/edit-profile/', EditProfileView.as_view(), name='user_edit_page'),
+    path('async/login/', AsyncLoginView.as_view(), name='async_login_page'),
+    path('async/signup/', AsyncSignupView.as_view(), name='async_signup_page'),
+    path('async/profile/<str:username>/update-password/', AsyncUpdatePasswordView.as_view(), name='async_password_reset_page'),
 ]
\ No newline at end of file
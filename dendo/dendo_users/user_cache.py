@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from dendo.perf import count_cache
+
+
+class SessionUserCache:
+    """
+    Caches the user AuthenticationMiddleware loads for a session, keyed by
+    primary key, so authenticated requests do not query CustomUsers.
+
+    Enabled by AUTH_USER_CACHE (a cache alias). It should point at a cache
+    shared by all processes, otherwise a password change in one process
+    would not invalidate the user cached by another. Entries are dropped on
+    CustomUser save/delete and on password change.
+    """
+
+    KEY_PREFIX = 'dendo_users:session_user'
+
+    @staticmethod
+    def _cache():
+        alias = getattr(settings, 'AUTH_USER_CACHE', None)
+        if not alias:
+            return None
+        return caches[alias]
+
+    @classmethod
+    def _key(cls, pk):
+        return f'{cls.KEY_PREFIX}:{pk}'
+
+    @staticmethod
+    def _timeout():
+        return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300)
+
+    @classmethod
+    def get(cls, pk):
+        cache = cls._cache()
+        if cache is None:
+            return None
+        return count_cache(cache.get(cls._key(pk)))
+
+    @classmethod
+    async def aget(cls, pk):
+        cache = cls._cache()
+        if cache is None:
+            return None
+        return count_cache(await cache.aget(cls._key(pk)))
+
+    @classmethod
+    def set(cls, user):
+        cache = cls._cache()
+        if cache is not None:
+            cache.set(cls._key(user.pk), user, cls._timeout())
+
+    @classmethod
+    async def aset(cls, user):
+        cache = cls._cache()
+        if cache is not None:
+            await cache.aset(cls._key(user.pk), user, cls._timeout())
+
+    @classmethod
+    def invalidate(cls, user):
+        cache = cls._cache()
+        if cache is not None:
+            cache.delete(cls._key(user.pk))
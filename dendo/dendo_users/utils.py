@@ -1,32 +1,58 @@
 import re
 
-from django.db.models import Q
-from django.contrib.auth import login
+from django.contrib.auth import alogin, login
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
+from dendo_activity.buffer import ActivityLog
+from dendo_activity.models import ActivityEvent
+
+from .hashing import amake_password
+from .identity import IdentityResolver
 from .models import CustomUser
+from .user_cache import SessionUserCache
 
 class UserHelper:    
     @staticmethod
     def get_user(value):
-        return CustomUser.objects.filter(Q(email=value) | Q(username=value)).first()
+        return IdentityResolver.resolve(value)
 
     @staticmethod
-    def login_user(request, username_or_email, password):
+    def authenticate_user(username_or_email, password):
         user = UserHelper.get_user(username_or_email)
 
         if user and user.check_password(password):
             user.backend = settings.AUTHENTICATION_BACKENDS[0]
-            login(request, user)
             return user
-        
+
         return None
 
+    @staticmethod
+    def login_user(request, user):
+        if user is None:
+            return None
+
+        if not hasattr(user, 'backend'):
+            user.backend = settings.AUTHENTICATION_BACKENDS[0]
+        login(request, user)
+        ActivityLog.record(user, ActivityEvent.LOGIN, request)
+        return user
+
+    @staticmethod
+    async def alogin_user(request, user):
+        if user is None:
+            return None
+
+        if not hasattr(user, 'backend'):
+            user.backend = settings.AUTHENTICATION_BACKENDS[0]
+        await alogin(request, user)
+        await ActivityLog.arecord(user, ActivityEvent.LOGIN, request)
+        return user
+
     @staticmethod
     def create_user(request, username, email, password):
-        if re.match(r'^[\w\.-]+@[\w\.-]+\.[a-zA-Z]{2,}$', username.strip()):
-            raise ValidationError("Username cannot be an email address.")
+        if IdentityResolver.is_email(username):
+            raise ValidationError("Username cannot contain '@'.")
 
         elif UserHelper.get_user(username.strip()):
             raise ValidationError("That username is already taken.")
@@ -43,7 +69,7 @@ class UserHelper:
             password=password
         )
 
-        return UserHelper.login_user(request, username, password)
+        return UserHelper.login_user(request, new_user)
     
     @staticmethod
     def update_password(user, new_password):
@@ -52,6 +78,42 @@ class UserHelper:
         if current_user and new_password:
             current_user.set_password(new_password)
             current_user.save()
+            SessionUserCache.invalidate(current_user)
+            ActivityLog.record(current_user, ActivityEvent.PASSWORD_CHANGE)
             return current_user
         
         return None
+
+    @staticmethod
+    async def acreate_user(request, username, email, password):
+        if IdentityResolver.is_email(username):
+            raise ValidationError("Username cannot contain '@'.")
+
+        elif await IdentityResolver.aresolve(username.strip()):
+            raise ValidationError("That username is already taken.")
+
+        elif await IdentityResolver.aresolve(email.strip().lower()):
+            raise ValidationError("Email is already in use.")
+
+        elif not re.match(r"^.{8,}$", password):
+            raise ValidationError("Password must be at least 8 characters long")
+
+        new_user = CustomUser(
+            username=CustomUser.normalize_username(username.strip()),
+            email=email.strip().lower(),
+            password=await amake_password(password)
+        )
+        await new_user.asave()
+
+        return await UserHelper.alogin_user(request, new_user)
+
+    @staticmethod
+    async def aupdate_password(user, new_password):
+        if user and new_password:
+            user.password = await amake_password(new_password)
+            await user.asave()
+            SessionUserCache.invalidate(user)
+            await ActivityLog.arecord(user, ActivityEvent.PASSWORD_CHANGE)
+            return user
+
+        return None
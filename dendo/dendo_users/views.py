@@ -1,14 +1,28 @@
+from django.conf import settings
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
+from django.views.generic import View
+from django.views.generic.base import TemplateResponseMixin
 from django.views.generic.detail import DetailView
-from django.views.generic.edit import FormView
-from django.http import HttpResponse
+from django.views.generic.edit import FormMixin, FormView
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from dendo.routers import replica_reads
+from dendo_activity.counters import Counters
 
 from .forms import LogInForm, PasswordUpdateForm, SignUpForm, UserEditForm
+from .hashing import run_in_pool
+from .identity import IdentityResolver
 from .models import CustomUser
+from .profile_cache import ProfileCache
+from .search import UserSearch
+from .throttling import LoginThrottle
 from .utils import UserHelper
 
 
@@ -29,10 +43,13 @@ class LoginView(FormView):
     form_class = LogInForm
     success_url = reverse_lazy(HOME_PAGE_URL)
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+
     def form_valid(self, form):
-        username_or_email = form.cleaned_data.get('username_or_email')
-        password = form.cleaned_data.get('password')
-        user = UserHelper.login_user(self.request, username_or_email, password)
+        user = UserHelper.login_user(self.request, form.get_user())
 
         return super().form_valid(form)
 
@@ -114,4 +131,159 @@ class UserProfileView(DetailView):
     model = CustomUser
     template_name = 'dendo_users/userprofile.html'
     slug_field = "username"
-    slug_url_kwarg = "username"
\ No newline at end of file
+    slug_url_kwarg = "username"
+
+    def get_queryset(self):
+        return CustomUser.objects.for_profile_card()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['counts'] = Counters.get(self.object.pk)
+        return context
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            with replica_reads():
+                response = super().get(request, *args, **kwargs)
+            Counters.increment(self.object.pk, Counters.PROFILE_VIEWS)
+            return response
+
+        with replica_reads():
+            entry = ProfileCache.get(self.kwargs.get(self.slug_url_kwarg))
+        if entry is None:
+            # Filled from the primary: a page rendered from a lagging replica
+            # would be served to every visitor until the entry expires.
+            response = super().get(request, *args, **kwargs)
+            response.render()
+            # The page shows the counters: keep it no longer than they are cached.
+            timeout = min(getattr(settings, 'PROFILE_CACHE_TIMEOUT', 600), getattr(settings, 'COUNTER_CACHE_TIMEOUT', 60))
+            entry = ProfileCache.set(self.object, response, timeout)
+
+        response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+        if response is None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+
+        response.headers['ETag'] = entry['etag']
+        if entry['last_modified']:
+            response.headers['Last-Modified'] = http_date(entry['last_modified'])
+        patch_cache_control(response, no_cache=True)
+        Counters.increment(entry.get('user_id'), Counters.PROFILE_VIEWS)
+        return response
+
+
+class UserSearchView(View):
+    """
+    Username autocomplete: ``?q=<prefix>&after=<cursor>&limit=<n>`` returns
+    profile cards as JSON together with the cursor of the next page.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.GET.get('limit', UserSearch.PAGE_SIZE))
+        except ValueError:
+            limit = UserSearch.PAGE_SIZE
+
+        with replica_reads():
+            results, next_after = UserSearch.autocomplete(request.GET.get('q'), request.GET.get('after'), limit)
+
+        return JsonResponse({'results': results, 'next': next_after})
+
+
+class AsyncFormView(TemplateResponseMixin, FormMixin, View):
+    """
+    Async counterpart of FormView.
+
+    Identifiers the form will look up are resolved with the async ORM first
+    (see prepare_form), which fills the request memo; validation itself,
+    including any password hashing, then runs in the bounded auth pool so
+    the event loop stays free.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        form = self.get_form()
+
+        with IdentityResolver.memo():
+            await self.prepare_form(form)
+            if await run_in_pool(form.is_valid):
+                return await self.aform_valid(form)
+
+        return self.form_invalid(form)
+
+    async def prepare_form(self, form):
+        pass
+
+    async def aform_valid(self, form):
+        return redirect(self.get_success_url())
+
+class AsyncLoginView(AsyncFormView):
+    template_name = 'dendo_users/login.html'
+    form_class = LogInForm
+    success_url = reverse_lazy(HOME_PAGE_URL)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+
+    async def prepare_form(self, form):
+        identifier = form.data.get('username_or_email')
+        # A throttled attempt is rejected by the form without any lookup.
+        if await run_in_pool(LoginThrottle.check, LoginThrottle.client_ip(self.request), identifier):
+            return
+        await IdentityResolver.aresolve(identifier)
+
+    async def aform_valid(self, form):
+        user = await UserHelper.alogin_user(self.request, form.get_user())
+
+        return await super().aform_valid(form)
+
+class AsyncSignupView(AsyncFormView):
+    template_name = 'dendo_users/signup.html'
+    form_class = SignUpForm
+    success_url = reverse_lazy(HOME_PAGE_URL)
+
+    async def prepare_form(self, form):
+        await IdentityResolver.aresolve(form.data.get('username'))
+        await IdentityResolver.aresolve(form.data.get('email'))
+
+    async def aform_valid(self, form):
+        new_user = await UserHelper.acreate_user(
+            self.request,
+            form.cleaned_data.get('username'),
+            form.cleaned_data.get('email'),
+            form.cleaned_data.get('password')
+        )
+        return await super().aform_valid(form)
+
+class AsyncUpdatePasswordView(AsyncFormView):
+    template_name = 'dendo_users/resetpassword.html'
+    form_class = PasswordUpdateForm
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.user = await request.auser()
+        if not self.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        if await IdentityResolver.aresolve(self.kwargs.get('username')) != self.user:
+            return redirect(request.META.get('HTTP_REFERER', HOME_PAGE_URL))
+
+        return await super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['current_password_hash'] = self.user.password
+
+        return kwargs
+
+    async def aform_valid(self, form):
+        new_password = form.cleaned_data.get('new_password')
+
+        response = await UserHelper.aupdate_password(self.user, new_password)
+
+        return await super().aform_valid(form)
+
+    def get_success_url(self):
+        return reverse_lazy('dendo_users:user_page', kwargs={'username': self.user.username})